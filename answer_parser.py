@@ -0,0 +1,307 @@
+"""
+Map free-form model output to answer option indices.
+
+Shared by autoanswer.py, evaluate.py and "simpler one". Handles:
+
+    letters        "B", "(c)", "Answer: D", "**E**" - any number of options
+    numbers        "Option 3", "answer: 2" (1-based) - unless the number is
+                   itself an option ("4" among 2/4/6/8 is the option "4")
+    multi-select   "A and C", "Answers: B, D" (parse_answers / multi=True)
+    true/false     "True", "no", "not true" when the options are True/False
+                   or Yes/No
+    text           "Paris" or "The answer is Paris." matched to the options,
+                   with a fuzzy fallback for near-misses and typos
+
+Anything that names two different options (letter vs text disagreeing,
+"A or B", two letters in single-answer mode) is rejected as ambiguous
+rather than guessed.
+
+    python answer_parser.py --bench [N]
+
+checks REGRESSIONS, then runs the parser over N synthetic model outputs
+and compares it with the old "first of A-D anywhere in the text" parser.
+"""
+import difflib
+import random
+import re
+import string
+import sys
+import time
+from collections import namedtuple
+
+FUZZY_MIN = 0.8           # SequenceMatcher ratio for a fuzzy text match
+FUZZY_MARGIN = 0.1        # ... and its lead over the runner-up
+
+Parsed = namedtuple("Parsed", ["indices", "method"])   # indices: tuple, () if rejected
+
+_markup = re.compile(r"[*_`\"'“”‘’]")
+# One option reference: "(c)", "[2]", "C", "C)", "3." or a bare lower-case
+# letter only when nothing follows it ("answer: c"), so "is a dog" is not "A".
+_ITEM = (r"(?:[\(\[](?:[A-Za-z]|\d{1,2})[\)\]]"
+         r"|(?:[A-Z]|\d{1,2})(?![A-Za-z0-9])[\).]?"
+         r"|[a-z](?=[\).,:]|\s*$))")
+_marker = re.compile(
+    r"(?i:\b(?:answers?|options?|choices?)\b)\s*(?:(?i:is|are|would be)|:|=|-)?\s*"
+    rf"({_ITEM}(?:\s*(?:,|&|and|\+)\s*{_ITEM})*)")
+_marker_item = re.compile(r"(?<![A-Za-z])([A-Za-z]|\d{1,2})(?![A-Za-z0-9])")
+_letter = re.compile(r"(?<![A-Za-z0-9'])([A-Z])(?:[\)\].:]|(?![A-Za-z0-9']))")
+_whole = re.compile(r"^[\(\[]?([A-Za-z]|\d{1,2})[\)\].:]?$")
+_words = re.compile(r"\w+")
+_either = re.compile(r"\b(?:or|either)\b", re.IGNORECASE)
+
+TRUE_WORDS = {"true", "yes"}
+FALSE_WORDS = {"false", "no"}
+# "not true", "isn't false" (apostrophes are stripped with the markup)
+NEGATIONS = {"not", "never", "isnt", "arent", "wasnt", "werent", "dont", "doesnt", "cant", "wont"}
+
+# -------------------------------------------------
+def option_letters(n):
+    """'A, B, C or D' for prompts."""
+    letters = [string.ascii_uppercase[i] for i in range(min(n, 26))]
+    return letters[0] if len(letters) == 1 else ", ".join(letters[:-1]) + " or " + letters[-1]
+
+def _norm(text):
+    return " ".join(_words.findall(text.lower()))
+
+def _item_index(item, n, texts=()):
+    if item.isdigit():
+        if texts is None or item.lstrip("0") in texts:
+            return None     # "4" names the option "4", not the fourth one
+        idx = int(item) - 1
+    else:
+        idx = ord(item.upper()) - 65
+    return idx if 0 <= idx < n else None
+
+def _by_letters(text, n, texts=()):
+    """Indices named by letters/numbers, or None if nothing letter-like was found.
+
+    `texts` are numeric option texts that must not be read as 1-based
+    indices (None: no number is an index, all options are numbers).
+    """
+    m = _whole.match(text)
+    if m:
+        idx = _item_index(m.group(1), n, texts)
+        if idx is not None or not m.group(1).isdigit():
+            return {idx} if idx is not None else set()
+
+    found = set()
+    for m in _marker.finditer(text):
+        for item in _marker_item.findall(m.group(1)):
+            idx = _item_index(item, n, texts)
+            if idx is not None:
+                found.add(idx)
+    if found:
+        return found
+
+    for m in _letter.finditer(text):
+        ch = m.group(1)
+        after = text[m.end():m.end() + 12]
+        # "A dog", "I think": the article / pronoun, not an option letter.
+        if ch in "AI" and re.match(r"\s+[a-z]", after) and not re.match(r"\s+(?:is|and|or)\b", after):
+            continue
+        idx = ord(ch) - 65
+        if idx < n:
+            found.add(idx)
+    return found or None
+
+def _true_false(text, options):
+    norm = [_norm(o) for o in options]
+    if len(options) != 2 or not ({norm[0], norm[1]} in ({"true", "false"}, {"yes", "no"})):
+        return None
+    words = _words.findall(text.lower())
+    says_true = says_false = False
+    for i, w in enumerate(words):
+        if w not in TRUE_WORDS and w not in FALSE_WORDS:
+            continue
+        negated = i > 0 and words[i - 1] in NEGATIONS
+        if (w in TRUE_WORDS) != negated:
+            says_true = True
+        else:
+            says_false = True
+    if says_true == says_false:
+        return None
+    want = ("true", "yes") if says_true else ("false", "no")
+    return {i for i, o in enumerate(norm) if o in want}
+
+def _by_text(text, options):
+    """Indices whose option text appears in the output; fuzzy fallback for one option."""
+    out = _norm(text)
+    if not out:
+        return None
+    padded = f" {out} "
+    norms = [_norm(o) for o in options]
+    hits = {i for i, o in enumerate(norms) if o and f" {o} " in padded}
+    # "Paris" inside "Paris Texas": keep only the longest of nested matches.
+    hits = {i for i in hits if not any(j != i and norms[i] in norms[j] and len(norms[j]) > len(norms[i])
+                                       for j in hits)}
+    if hits:
+        return hits
+
+    if len(out) > 2 * max(len(o) for o in norms) + 20:
+        return None
+    scores = sorted(((difflib.SequenceMatcher(None, out, o).ratio(), i) for i, o in enumerate(norms)),
+                    reverse=True)
+    best, idx = scores[0]
+    runner = scores[1][0] if len(scores) > 1 else 0.0
+    if best >= FUZZY_MIN and best - runner >= FUZZY_MARGIN:
+        return {idx}
+    return None
+
+def parse(text, options, multi=False):
+    """Return Parsed(indices, method); indices is () when unparsed or ambiguous."""
+    n = len(options)
+    text = _markup.sub("", text or "").strip()
+    if not text or not n:
+        return Parsed((), None)
+
+    # An output that is exactly one option's text is that option, whatever
+    # else it could be read as ("4" among 2/4/6/8, "A" among blood types).
+    norms = [_norm(o) for o in options]
+    out = _norm(text)
+    if out and norms.count(out) == 1:
+        return Parsed((norms.index(out),), "text")
+
+    numbers = {o.lstrip("0") for o in norms if o.isdigit()}
+    letters = _by_letters(text, n, None if len(numbers) == n else numbers)
+    tf = _true_false(text, options)
+    textual = _by_text(text, options) if tf is None else None
+
+    candidates = [(m, s) for m, s in (("letter", letters), ("truefalse", tf), ("text", textual)) if s]
+    if not candidates:
+        return Parsed((), None)
+    method, chosen = candidates[0]
+    for _, other in candidates[1:]:
+        # A letter and an option text that point at different options.
+        if other != chosen and not (multi and other <= chosen):
+            return Parsed((), "ambiguous")
+
+    if not multi and (len(chosen) != 1 or _either.search(text) and letters and len(letters) > 1):
+        return Parsed((), "ambiguous")
+    return Parsed(tuple(sorted(chosen)), method)
+
+def parse_answer(text, options):
+    """Single answer index, or None."""
+    p = parse(text, options)
+    return p.indices[0] if p.indices else None
+
+def parse_answers(text, options):
+    """Tuple of indices for multi-select questions, or None."""
+    p = parse(text, options, multi=True)
+    return p.indices or None
+
+def build_guess_prompt(question, answers):
+    """Quiz prompt for the local model, options lettered A), B), ..."""
+    labeled = [f"{chr(65+i)}) {ans}" for i, ans in enumerate(answers)]
+    joined = "\n".join(labeled)
+
+    # The instructions live in ollama_client.QUIZ_SYSTEM_PROMPT, which Ollama keeps cached.
+    return f"Question: {question}\n{joined}\nAnswer:"
+
+def parse_guess(text, answers):
+    """Map raw model output to an answer index, or None (unparsed or ambiguous)."""
+    return parse_answer(text, answers)
+
+# -------------------------------------------------
+# Benchmark
+# -------------------------------------------------
+WORDS = ["Paris", "London", "Mercury", "Venus", "1889", "1914", "Einstein", "Newton", "Blue whale",
+         "Elephant", "Oxygen", "Nitrogen", "Pacific Ocean", "Atlantic Ocean", "Leonardo da Vinci",
+         "Michelangelo", "Photosynthesis", "Respiration", "Tokyo", "Kyoto", "Au", "Ag", "Mars"]
+
+def _legacy(text):
+    ans = text.strip().upper()
+    for ch in ["A", "B", "C", "D"]:
+        if ch in ans:
+            return ["A", "B", "C", "D"].index(ch)
+    return None
+
+def synthetic(rng):
+    """Return (output, options, expected index / index tuple / None, multi)."""
+    kind = rng.random()
+    if kind < 0.1:
+        options = rng.sample(WORDS, rng.randint(3, 6))
+        picks = tuple(sorted(rng.sample(range(len(options)), 2)))
+        a, b = (chr(65 + p) for p in picks)
+        text = rng.choice(["{a} and {b}", "Answers: {a}, {b}", "{a}, {b}", "{oa} and {ob}"])
+        return (text.format(a=a, b=b, oa=options[picks[0]], ob=options[picks[1]]),
+                options, picks, True)
+    if kind < 0.2:
+        options = rng.choice([["True", "False"], ["Yes", "No"]])
+        i = rng.randrange(2)
+        word, other = options[i], options[1 - i]
+        text = rng.choice(["{w}", "{w}.", "The statement is {l}.", "Answer: {w}", "**{w}**",
+                           "Not {x}", "It isn't {xl}.", "That is not {xl}, so {l}."])
+        return text.format(w=word, l=word.lower(), x=other, xl=other.lower()), options, i, False
+    if kind < 0.3:
+        # Numeric options, where "4" is an option's text rather than the fourth option.
+        options = [str(v) for v in sorted(rng.sample(range(13), 4))]
+        i = rng.randrange(4)
+        text = rng.choice(["{o}", "{o}.", "Answer: {o}", "The answer is {o}.", "{L}", "{L}) {o}"])
+        return text.format(o=options[i], L=chr(65 + i)), options, i, False
+
+    options = rng.sample(WORDS, rng.randint(2, 6))
+    i = rng.randrange(len(options))
+    L = chr(65 + i)
+    other = chr(65 + (i + 1) % len(options))
+    templates = [
+        ("{L}", i), ("{L})", i), ("({l})", i), ("Answer: {L}", i), ("The answer is {L}.", i),
+        ("**{L}**", i), ("{L}) {o}", i), ("I think the answer is {L}, {o}.", i),
+        ("{o}", i), ("The correct answer is {o}.", i), ("{o_typo}", i), ("Option {n}", i),
+        ("A good guess would be {L}", i), ("answer - {l}", i),
+        ("The answer is a word: {o}", i), ("Answers: {L}", i),
+        ("{L} or {X}", None), ("{L}) {o_other}", None), ("I don't know.", None),
+        ("Either {o} or {o_other}", None), ("", None),
+    ]
+    tpl, expected = rng.choice(templates)
+    o = options[i]
+    typo = o[:-1] + rng.choice("aeiou") if len(o) > 5 else o
+    text = tpl.format(L=L, l=L.lower(), o=o, o_typo=typo, n=i + 1, X=other,
+                      o_other=options[(i + 1) % len(options)])
+    return text, options, expected, False
+
+# Outputs that broke earlier versions: (output, options, expected).
+REGRESSIONS = [
+    ("Not true", ["True", "False"], 1),
+    ("It isn't false.", ["True", "False"], 0),
+    ("4", ["2", "4", "6", "8"], 1),
+    ("Answer: 8", ["2", "4", "6", "8"], 3),
+    ("3", ["2", "4", "6", "8"], None),
+    ("AB", ["A", "B", "AB", "O"], 2),
+    ("The correct answer is False", ["True", "False"], 1),
+    ("a dog", ["Cat", "Dog", "Bird"], 1),
+]
+
+def bench(n=5000, seed=0):
+    rng = random.Random(seed)
+    cases = [synthetic(rng) for _ in range(n)]
+
+    failed = [(t, o, e, parse_answer(t, o)) for t, o, e in REGRESSIONS if parse_answer(t, o) != e]
+    print(f"regressions: {len(REGRESSIONS) - len(failed)}/{len(REGRESSIONS)} pass")
+    for text, options, expected, got in failed:
+        print(f"  {text!r} {options}: expected {expected}, got {got}")
+
+    def score(fn):
+        right = wrong = 0
+        t0 = time.perf_counter()
+        for text, options, expected, multi in cases:
+            got = fn(text, options, multi)
+            if got == expected:
+                right += 1
+            elif got is not None:
+                wrong += 1      # wrong option, or a guess on an ambiguous output
+        per = (time.perf_counter() - t0) / n * 1e6
+        return right, wrong, per
+
+    expected_none = sum(c[2] is None for c in cases)
+    print(f"{n} synthetic outputs ({expected_none} should be rejected)\n")
+    print(f"{'parser':<14}{'correct':>9}{'wrong':>8}{'missed':>8}{'µs/parse':>10}")
+    ours = lambda t, o, multi: parse_answers(t, o) if multi else parse_answer(t, o)
+    for name, fn in (("answer_parser", ours), ("legacy A-D", lambda t, _o, _m: _legacy(t))):
+        right, wrong, per = score(fn)
+        print(f"{name:<14}{right / n:>9.1%}{wrong / n:>8.1%}{(n - right - wrong) / n:>8.1%}{per:>10.1f}")
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--bench"]:
+        bench(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
+    else:
+        print(__doc__)
@@ -0,0 +1,58 @@
+"""
+Append-only JSON-lines logs, shared by kahoot_cache.py (the answer cache
+log) and embedding_service.py (the vector index journal).
+
+Every record is one JSON object on its own line, written with a single
+append. A crash can therefore only leave a partial last line with no
+newline; replay() skips it and, for the process that owns the log
+(repair=True), cuts it off so later appends start on a fresh line. A bad
+line anywhere else is skipped, never truncated, since the records after it
+are intact. Readers never write to the file.
+"""
+import json
+
+
+def replay(path, offset=0, repair=False, end=None):
+    """Read the records of the log at `path` from byte `offset` (up to `end`).
+
+    Returns (records, end), where end is the offset just past the last
+    complete line (the offset to resume from). A missing file reads as
+    empty.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read() if end is None else f.read(max(0, end - offset))
+    except FileNotFoundError:
+        return [], offset
+    records = []
+    end = offset
+    pos = 0
+    while pos < len(data):
+        nl = data.find(b"\n", pos)
+        if nl < 0:
+            # Torn last line: a crash mid-append (or another process still
+            # writing it). Only the owner may cut it off.
+            if repair:
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+            break
+        line, pos = data[pos:nl + 1], nl + 1
+        end += len(line)
+        try:
+            records.append(json.loads(line))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+    return records, end
+
+
+def encode(record):
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def append(path, records):
+    """Append `records` to the log in one write; returns the bytes written."""
+    data = b"".join(encode(r) for r in records)
+    with open(path, "ab") as f:
+        f.write(data)
+    return len(data)
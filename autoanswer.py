@@ -1,98 +1,78 @@
-import json, time, hashlib, keyboard, cv2, numpy as np
+import lazy_import
+lazy_import.preload("numpy", "cv2", "detector", "rag", "sentence_transformers")   # heavy imports overlap with browser launch
+import os, time
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from rag import ask_with_rag   # 🔹 Import AI RAG pipeline
+from driver_resolver import resolve_driver
+from browser_session import open_session, close_session
+import tracing
+from scan_schedule import ScanSchedule, click_and_scan, record_outcome, correction_handlers
+from profiler import QuestionProfiler, start_hotkey, PROFILE_KEY
+from inputs import open_input, CorrectionWindow
+from answer_parser import build_guess_prompt, parse_guess
+from kahoot_cache import CACHE_FILE, load_cache, save_cache, make_key, confidence, answer_index
 
 # -------------------------------------------------
 # --- Configuration ---
-SCAN_INTERVAL = 0.25      # seconds between scans
-SCAN_DURATION = 2.0       # total time to scan after answering
-CACHE_FILE = "kahoot_cache.json"
+SCAN_DURATION = 2.0       # max time to scan after answering (see scan_schedule.py)
+CORRECTION_WINDOW = 3.0   # seconds to press Shift+1–4 after a miss
+REUSE_BROWSER = True      # attach to a persistent browser instead of launching a new one
 # -------------------------------------------------
 
-def load_cache():
-    try:
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-
-def save_cache(cache):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
-
-def make_key(question, answers):
-    key_text = question.strip().lower() + "|" + "|".join(sorted(a.strip().lower() for a in answers))
-    return hashlib.sha1(key_text.encode()).hexdigest()
-
-# -------------------------------------------------
-def count_green_checks(driver):
-    """Screenshot bottom-right corner and count green check icons."""
-    driver.save_screenshot("frame.png")
-    img = cv2.imread("frame.png")
-    if img is None:
-        return 0
-
-    h, w, _ = img.shape
-    crop = img[int(h * 0.6):h, int(w * 0.6):w]
-    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
-
-    lower = np.array([45, 80, 80])
-    upper = np.array([90, 255, 255])
-    mask = cv2.inRange(hsv, lower, upper)
-
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    valid = [c for c in contours if 200 < cv2.contourArea(c) < 5000]
-    return len(valid)
-
 # -------------------------------------------------
-def ai_guess(question, answers):
+def ai_guess(question, answers, stats=None):
     """Use local phi:latest AI (via rag.py) to pick an answer."""
     if not answers:
         return None
 
-    # Only support up to 4 choices for now
-    labeled = [f"{chr(65+i)}) {ans}" for i, ans in enumerate(answers[:4])]
-    joined = "\n".join(labeled)
-
-    prompt = (
-        f"You are an AI answering a multiple-choice quiz question.\n"
-        f"Return ONLY the letter (A, B, C, or D) of the best answer.\n\n"
-        f"Question: {question}\n\n"
-        f"{joined}\n\n"
-        f"Reply with just one letter (A, B, C, or D)."
-    )
-
     try:
-        ans = ask_with_rag(prompt).strip().upper()
-        print("🤖 Raw AI output:", ans)
-        for ch in ["A", "B", "C", "D"]:
-            if ch in ans:
-                return ["A", "B", "C", "D"].index(ch)
+        rag = lazy_import.get("rag")   # 🔹 AI RAG pipeline, imported in the background
+        query = question + "\n" + "\n".join(answers)
+        ans = rag.ask_with_rag(build_guess_prompt(question, answers), stats=stats, query=query, quiz=True)
+        print("🤖 Raw AI output:", ans.strip().upper())
+        return parse_guess(ans, answers)
     except Exception as e:
         print("AI guess failed:", e)
     return None
 
 # -------------------------------------------------
 def main():
-    opts = Options()
-    opts.add_argument("--start-maximized")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
-    driver.get("https://kahoot.it")
+    if REUSE_BROWSER:
+        driver = open_session("chrome", "https://kahoot.it")
+    else:
+        opts = Options()
+        opts.add_argument("--start-maximized")
+        driver = webdriver.Chrome(service=Service(resolve_driver("chrome")), options=opts)
+        driver.get("https://kahoot.it")
+    print(f"🟣 Browser ready after {lazy_import.since_start():.1f}s")
 
     print("🟣 Join Kahoot manually.")
     input("Press Enter when a question is visible...")
+    print(lazy_import.report())
+    gate = lazy_import.get("detector").FrameGate()
+    schedule = ScanSchedule(SCAN_DURATION)
 
     cache = load_cache()
     print(f"Loaded {len(cache)} cached questions.\n")
+    try:
+        lazy_import.get("rag").index_verified_answers(cache)
+    except Exception as e:
+        print("Indexing verified answers failed:", e)
+    keys = open_input()
+    profiler = QuestionProfiler(out_dir=os.path.dirname(os.path.abspath(CACHE_FILE)))
+    start_hotkey(profiler)
+    print(f"(Press {PROFILE_KEY.upper()} to profile the next few questions)")
+
+    on_correction, on_expire = correction_handlers(cache)
+    corrections = CorrectionWindow(keys, on_correction, on_expire, timeout=CORRECTION_WINDOW)
 
     last_q = ""
 
     while True:
         try:
+            t_scrape = time.perf_counter()
             q_el = driver.find_element(By.CSS_SELECTOR, '[data-functional-selector="block-title"]')
             question = q_el.text.strip()
             if not question or question == last_q:
@@ -104,6 +84,9 @@ def main():
             if not answers:
                 time.sleep(0.2)
                 continue
+            tracing.begin(question, answers=answers, script="autoanswer")
+            tracing.add("scrape", time.perf_counter() - t_scrape)
+            profiler.on_question()
 
             print("\n============================")
             print(f"QUESTION: {question}")
@@ -113,68 +96,33 @@ def main():
 
             q_key = make_key(question, answers)
 
-            # --- Cached question ---
-            if q_key in cache:
-                corr = cache[q_key]["correct"]
-                print(f"⚡ Cached answer found: {corr}")
-                for b in driver.find_elements(By.CSS_SELECTOR, "button.choice__Choice-sc-ym3b8f-4"):
-                    if corr.lower() in b.text.lower():
-                        b.click()
-                        print("✅ Clicked cached correct answer.")
-                        break
-                last_q = question
-                continue
+            # --- Cached question (clicked and verified like an AI guess) ---
+            cached = cache.lookup(q_key)
+            idx = answer_index(cached, answers)
+            if idx is not None:
+                conf = confidence(cached)
+                print(f"⚡ Cached answer found: {answers[idx]} ({conf:.0%} confidence)")
+                tracing.note(cache="hit", backend="cache", confidence=round(conf, 2))
+            else:
+                cached = None
 
-            # --- AI guess ---
-            idx = ai_guess(question, answers)
+                # --- AI guess ---
+                tracing.note(cache="miss", backend="rag")
+                with tracing.span("ai_guess"):
+                    idx = ai_guess(question, answers)
             if idx is not None and 0 <= idx < len(answers):
-                print(f"🤖 AI guessed option {idx+1}: {answers[idx]}")
+                if not cached:
+                    print(f"🤖 AI guessed option {idx+1}: {answers[idx]}")
                 buttons = driver.find_elements(By.CSS_SELECTOR, "button.choice__Choice-sc-ym3b8f-4")
                 if idx < len(buttons):
-                    before = count_green_checks(driver)
-                    buttons[idx].click()
-                    print(f"🖱️ Clicked: {answers[idx]}")
-
-                    # --- Scan loop for checkmark detection ---
-                    correct = None
-                    before = count_green_checks(driver)
-                    for _ in range(int(SCAN_DURATION / SCAN_INTERVAL)):
-                        time.sleep(SCAN_INTERVAL)
-                        after = count_green_checks(driver)
-                        if after > before:
-                            correct = answers[idx]
-                            print("✅ Correct answer detected (checkmark counter):", correct)
-                            cache[q_key] = {"question": question, "answers": answers, "correct": correct}
-                            save_cache(cache)
-                            print("💾 Saved to cache.")
-                            break
-
-                    # --- Manual correction if wrong ---
-                    if not correct:
-                        print("❌ No checkmark detected — if you know the correct answer, press Shift+1–4 now.")
-                        correction = None
-                        wait_start = time.time()
-                        while time.time() - wait_start < 3:
-                            if keyboard.is_pressed("shift+1"): correction = 0
-                            elif keyboard.is_pressed("shift+2"): correction = 1
-                            elif keyboard.is_pressed("shift+3"): correction = 2
-                            elif keyboard.is_pressed("shift+4"): correction = 3
-                            if correction is not None:
-                                break
-                            time.sleep(0.05)
-
-                        if correction is not None and 0 <= correction < len(answers):
-                            correct = answers[correction]
-                            print(f"✅ Manual correction received: {correct}")
-                            cache[q_key] = {"question": question, "answers": answers, "correct": correct}
-                            save_cache(cache)
-                            print("💾 Saved to cache.")
-                        else:
-                            print("ℹ️ No correction provided. Moving on without saving.")
+                    outcome = click_and_scan(driver, gate, schedule, buttons[idx], answers[idx])
+                    record_outcome(cache, corrections, q_key, question, answers, idx, cached, outcome)
 
             else:
                 print("❌ AI did not produce a valid guess, skipping.")
 
+            tracing.end()
+
             # --- Wait for next question ---
             last_q = question
             print("Waiting for next question...")
@@ -194,7 +142,12 @@ def main():
             print("Error:", e)
             time.sleep(0.2)
 
-    driver.quit()
+    print(f"🖼️ Result detector: {gate.report()}")
+    profiler.stop()
+    corrections.close()
+    keys.close()
+    close_session(driver, keep=REUSE_BROWSER)
+    print(f"🗂️ Cache: {cache.report()}")
     save_cache(cache)
     print("✅ Session ended, cache saved.")
 
@@ -0,0 +1,145 @@
+"""
+Long-lived browser sessions shared across games and script restarts.
+
+Instead of launching a fresh browser (and, for Firefox, copying the whole
+profile) on every run, the browser is started once with a debugging
+endpoint and later runs simply attach to it:
+
+    Chrome   --remote-debugging-port=CHROME_DEBUG_PORT, own user-data-dir
+    Firefox  -marionette on FIREFOX_MARIONETTE_PORT, geckodriver --connect-existing
+
+close_session(driver) detaches without closing the browser, so the next
+start (and the joined Kahoot game) is a few milliseconds away.
+"""
+import os
+import socket
+import subprocess
+import time
+
+from selenium import webdriver
+
+from driver_resolver import browser_binary, resolve_driver
+
+CHROME_DEBUG_PORT = 9222
+FIREFOX_MARIONETTE_PORT = 2828
+CHROME_PROFILE_DIR = "chrome_session_profile"
+LAUNCH_TIMEOUT = 20.0     # seconds to wait for a freshly launched browser
+
+# -------------------------------------------------
+def _port_open(port, host="127.0.0.1"):
+    try:
+        with socket.create_connection((host, port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+def session_running(browser):
+    """True if the persistent browser's debugging endpoint is up."""
+    return _port_open(CHROME_DEBUG_PORT if browser == "chrome" else FIREFOX_MARIONETTE_PORT)
+
+def _spawn(args):
+    """Start the browser fully detached so it outlives this script."""
+    kwargs = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen(args, **kwargs)
+
+def _wait_for_port(port):
+    deadline = time.monotonic() + LAUNCH_TIMEOUT
+    while time.monotonic() < deadline:
+        if _port_open(port):
+            return
+        time.sleep(0.05)
+    raise RuntimeError(f"Browser debugging port {port} did not open")
+
+# -------------------------------------------------
+def _chrome(url):
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+
+    launched = False
+    if not _port_open(CHROME_DEBUG_PORT):
+        exe = browser_binary("chrome")
+        if not exe:
+            raise RuntimeError("Chrome executable not found")
+        _spawn([
+            exe,
+            f"--remote-debugging-port={CHROME_DEBUG_PORT}",
+            f"--user-data-dir={os.path.abspath(CHROME_PROFILE_DIR)}",
+            "--start-maximized",
+            "--no-first-run",
+            url,
+        ])
+        _wait_for_port(CHROME_DEBUG_PORT)
+        launched = True
+
+    opts = Options()
+    opts.debugger_address = f"127.0.0.1:{CHROME_DEBUG_PORT}"
+    driver = webdriver.Chrome(service=Service(resolve_driver("chrome")), options=opts)
+    return driver, launched
+
+def _firefox(url, profile_dir=None):
+    from selenium.webdriver.firefox.service import Service
+    from selenium.webdriver.firefox.options import Options
+
+    launched = False
+    if not _port_open(FIREFOX_MARIONETTE_PORT):
+        exe = browser_binary("firefox")
+        if not exe:
+            raise RuntimeError("Firefox executable not found")
+        args = [exe, "-marionette", "-no-remote"]
+        if profile_dir:
+            args += ["-profile", profile_dir]
+        _spawn(args + [url])
+        _wait_for_port(FIREFOX_MARIONETTE_PORT)
+        launched = True
+
+    service = Service(
+        resolve_driver("firefox"),
+        service_args=["--connect-existing", "--marionette-port", str(FIREFOX_MARIONETTE_PORT)],
+    )
+    driver = webdriver.Firefox(service=service, options=Options())
+    return driver, launched
+
+# -------------------------------------------------
+def open_session(browser, url="https://kahoot.it", profile_dir=None):
+    """Attach to the persistent browser, launching it first if needed.
+
+    Only navigates when the browser is not already on the Kahoot host, so
+    a restart keeps an in-progress game.
+    """
+    t0 = time.perf_counter()
+    if browser == "chrome":
+        driver, launched = _chrome(url)
+    elif browser == "firefox":
+        driver, launched = _firefox(url, profile_dir)
+    else:
+        raise ValueError(f"Unknown browser: {browser}")
+
+    try:
+        current = driver.current_url or ""
+    except Exception:
+        current = ""
+    host = url.split("//", 1)[-1].split("/", 1)[0]
+    if host not in current:
+        driver.get(url)
+
+    elapsed = time.perf_counter() - t0
+    if launched:
+        print(f"🌐 Launched persistent {browser} in {elapsed:.2f}s")
+    else:
+        print(f"🌐 Attached to running {browser} in {elapsed * 1000:.0f} ms")
+    return driver
+
+def close_session(driver, keep=True):
+    """Detach from the browser (keep=True) or shut it down."""
+    if not keep:
+        driver.quit()
+        return
+    try:
+        driver.service.stop()
+    except Exception:
+        pass
+    print("🌐 Browser left running for the next session.")
@@ -0,0 +1,100 @@
+"""
+Prompt context assembly under a token budget.
+
+The local model spends most of its time on prefill, so ask_with_rag no
+longer pastes retrieved passages verbatim. assemble() keeps the verified
+answers, then splits the passages into sentences, scores each by overlap
+with the question and options, and keeps the best ones that fit in
+CONTEXT_BUDGET tokens (in their original order, so they still read
+naturally).
+
+count_tokens() is a word/punctuation estimate scaled by a ratio that
+observe() keeps calibrated against the prompt_eval_count Ollama reports.
+"""
+import re
+import threading
+
+CONTEXT_BUDGET = 320      # tokens of retrieved context sent to the model
+EWMA_ALPHA = 0.2
+
+STOPWORDS = set("""
+a an and are as at be by for from has have in is it its of on or that the
+this to was were which who what when where why how with not do does did
+""".split())
+
+_word = re.compile(r"\w+")
+_piece = re.compile(r"\w+|[^\w\s]")
+_sentence_end = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_ratio = 1.0              # model tokens per counted piece
+_lock = threading.Lock()
+
+# -------------------------------------------------
+def tokenize(text):
+    """Lower-cased content words, for overlap scoring and BM25."""
+    return [w for w in _word.findall(text.lower()) if w not in STOPWORDS]
+
+def count_tokens(text):
+    return int(len(_piece.findall(text)) * _ratio) + 1
+
+def observe(prompt, actual_tokens):
+    """Fold a real prompt token count from Ollama into the estimate's ratio."""
+    global _ratio
+    pieces = len(_piece.findall(prompt))
+    if not pieces or not actual_tokens:
+        return
+    sample = actual_tokens / pieces
+    if not 0.7 <= sample <= 2.0:
+        return      # partly cached prefix or a different template; not a fair sample
+    with _lock:
+        _ratio += EWMA_ALPHA * (sample - _ratio)
+
+def split_sentences(text):
+    return [s.strip() for s in _sentence_end.split(text) if len(s.strip()) > 1]
+
+def extract_sentences(passages, query, budget):
+    """Best-overlapping sentences of `passages` that fit in `budget` tokens."""
+    terms = set(tokenize(query))
+    scored = []
+    seen = set()
+    for order, sentence in enumerate(s for p in passages for s in split_sentences(p)):
+        if sentence in seen:    # overlapping passages repeat sentences
+            continue
+        seen.add(sentence)
+        words = tokenize(sentence)
+        hits = sum(1 for w in set(words) if w in terms)
+        if hits:
+            # Favour dense matches over long sentences that mention one term.
+            scored.append((hits / (len(words) ** 0.5), order, sentence))
+    scored.sort(reverse=True)
+
+    kept, used = [], 0
+    for _, order, sentence in scored:
+        cost = count_tokens(sentence)
+        if used + cost > budget:
+            continue
+        kept.append((order, sentence))
+        used += cost
+    return " ".join(s for _, s in sorted(kept))
+
+def assemble(query, passages, verified="", budget=CONTEXT_BUDGET):
+    """Return (context, stats) with stats = {raw_tokens, context_tokens, saved_tokens}."""
+    raw = "\n\n".join([verified] + list(passages)).strip()
+    parts = []
+    remaining = budget
+    if verified:
+        parts.append(verified)
+        remaining -= count_tokens(verified)
+    if remaining > 0 and passages:
+        extract = extract_sentences(passages, query, remaining)
+        if extract:
+            parts.append(extract)
+    context = "\n\n".join(parts)
+
+    raw_tokens = count_tokens(raw) if raw else 0
+    context_tokens = count_tokens(context) if context else 0
+    return context, {
+        "raw_tokens": raw_tokens,
+        "context_tokens": context_tokens,
+        "saved_tokens": max(raw_tokens - context_tokens, 0),
+    }
@@ -0,0 +1,269 @@
+"""
+Result-screen detector for Kahoot.
+
+Classifies a screenshot as a correct / incorrect answer reveal with
+vectorized NumPy colour histograms over a downsampled frame, instead of an
+HSV inRange + findContours pass over the full-resolution crop.
+
+Two features are measured on a ~TARGET_WIDTH px wide copy of the frame,
+so thresholds are fractions and independent of the screen resolution:
+
+    banner_green / banner_red   share of saturated green / red pixels over
+                                the whole frame (the full-screen reveal)
+    icon_green                  share of green pixels in the bottom-right
+                                ROI where the check icons appear
+
+FrameGate wraps classify_png for the scan loops: it keeps a tiny block-mean
+fingerprint of the previous frame and returns the cached result when the
+screen has not changed (or the screenshot bytes are identical), counting
+how many frames it skipped.
+
+Thresholds live in CALIBRATION_FILE and can be learnt from labelled frames:
+
+    python detector.py calibrate correct:shot1.png incorrect:shot2.png other:frame.png
+    python detector.py classify frame.png image.png
+"""
+import json
+import sys
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+CALIBRATION_FILE = "detector_calibration.json"
+TARGET_WIDTH = 96         # columns kept after downsampling
+ICON_ROI = (0.6, 0.6)     # bottom-right crop: from 60% of height / width
+FINGERPRINT_GRID = (18, 32)   # rows, cols of block means
+FRAME_DIFF_EPS = 4.0      # max block-mean grey change for a frame to count as unchanged
+
+DEFAULT_THRESHOLDS = {
+    "banner": 0.35,       # min green/red share of the frame for a reveal banner
+    "icon_gain": 0.004,   # min rise in ROI green share for a new check icon
+    "min_sat": 80,        # HSV (OpenCV scale) saturation / value floor
+    "min_val": 80,
+    "green_hue": [45, 90],
+    "red_hue": [170, 10], # wraps around 180
+}
+
+Result = namedtuple("Result", ["label", "banner_green", "banner_red", "icon_green"])
+
+_thresholds = None
+
+# -------------------------------------------------
+def thresholds():
+    global _thresholds
+    if _thresholds is None:
+        _thresholds = dict(DEFAULT_THRESHOLDS)
+        try:
+            with open(CALIBRATION_FILE, "r", encoding="utf-8") as f:
+                _thresholds.update(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+    return _thresholds
+
+def downsample(img):
+    """Strided view of a BGR frame, roughly TARGET_WIDTH columns wide."""
+    step = max(1, img.shape[1] // TARGET_WIDTH)
+    return img[::step, ::step]
+
+def hue_sat_val(bgr):
+    """Vectorized BGR -> HSV on OpenCV's scale (H 0–180, S/V 0–255)."""
+    px = bgr.astype(np.int32)
+    b, g, r = px[..., 0], px[..., 1], px[..., 2]
+    mx = px.max(axis=-1)
+    mn = px.min(axis=-1)
+    delta = mx - mn
+    d = np.where(delta == 0, 1, delta)
+
+    hue = np.where(mx == r, (g - b) * 30 // d,
+          np.where(mx == g, 60 + (b - r) * 30 // d,
+                            120 + (r - g) * 30 // d)) % 180
+    sat = np.where(mx == 0, 0, delta * 255 // np.where(mx == 0, 1, mx))
+    return hue, sat, mx
+
+def _hue_hist(bgr, t):
+    """Histogram of hues (1-unit bins) over sufficiently saturated/bright pixels."""
+    hue, sat, val = hue_sat_val(bgr)
+    mask = (sat >= t["min_sat"]) & (val >= t["min_val"])
+    return np.bincount(hue[mask].ravel(), minlength=180), hue.size
+
+def _share(hist, total, hue_range):
+    lo, hi = hue_range
+    part = hist[lo:hi + 1].sum() if lo <= hi else hist[lo:].sum() + hist[:hi + 1].sum()
+    return float(part) / max(total, 1)
+
+def features(img):
+    """Return (banner_green, banner_red, icon_green) for a BGR frame."""
+    t = thresholds()
+    small = downsample(img)
+    hist, total = _hue_hist(small, t)
+
+    h, w = small.shape[:2]
+    roi = small[int(h * ICON_ROI[0]):, int(w * ICON_ROI[1]):]
+    roi_hist, roi_total = _hue_hist(roi, t)
+
+    return (_share(hist, total, t["green_hue"]),
+            _share(hist, total, t["red_hue"]),
+            _share(roi_hist, roi_total, t["green_hue"]))
+
+def classify(img):
+    """Classify a BGR frame as 'correct', 'incorrect' or 'unknown'."""
+    t = thresholds()
+    green, red, icon = features(img)
+    if green >= t["banner"] and green > red:
+        label = "correct"
+    elif red >= t["banner"]:
+        label = "incorrect"
+    else:
+        label = "unknown"
+    return Result(label, green, red, icon)
+
+def is_correct(after, before=None):
+    """True if `after` shows a correct reveal, or a new check icon versus `before`."""
+    if after.label == "correct":
+        return True
+    return before is not None and after.icon_green - before.icon_green > thresholds()["icon_gain"]
+
+# -------------------------------------------------
+# Frame sources
+# -------------------------------------------------
+def decode_png(png):
+    """Decode screenshot bytes at reduced size (we only need ~TARGET_WIDTH px)."""
+    import cv2
+    buf = np.frombuffer(png, dtype=np.uint8)
+    return cv2.imdecode(buf, cv2.IMREAD_REDUCED_COLOR_4)
+
+def read_frame(path):
+    import cv2
+    return cv2.imread(path)
+
+def classify_png(png):
+    img = decode_png(png)
+    if img is None:
+        return Result("unknown", 0.0, 0.0, 0.0)
+    return classify(img)
+
+# -------------------------------------------------
+# Frame-diff gating
+# -------------------------------------------------
+def fingerprint(img):
+    """Block-mean grey levels on a FINGERPRINT_GRID grid (float32)."""
+    rows, cols = FINGERPRINT_GRID
+    h, w = img.shape[:2]
+    by, bx = max(1, h // rows), max(1, w // cols)
+    grey = img[:by * rows, :bx * cols].mean(axis=2, dtype=np.float32)
+    return grey.reshape(grey.shape[0] // by, by, grey.shape[1] // bx, bx).mean(axis=(1, 3))
+
+class FrameGate:
+    """Skips decoding/classification of frames identical to the previous one.
+
+    Block means (rather than a whole-frame mean) keep a small check icon
+    appearing from being averaged away.
+    """
+
+    def __init__(self, eps=FRAME_DIFF_EPS):
+        self.eps = eps
+        self.frames = 0
+        self.skipped = 0
+        self._digest = None
+        self._fp = None
+        self._result = None
+
+    def classify_png(self, png):
+        self.frames += 1
+        digest = (len(png), zlib.crc32(png))
+        if digest == self._digest and self._result is not None:
+            self.skipped += 1
+            return self._result
+
+        img = decode_png(png)
+        if img is None:
+            return Result("unknown", 0.0, 0.0, 0.0)
+        fp = fingerprint(img)
+        self._digest = digest
+        if (self._result is not None and fp.shape == self._fp.shape
+                and float(np.abs(fp - self._fp).max()) < self.eps):
+            self.skipped += 1
+            return self._result
+
+        self._fp = fp
+        self._result = classify(img)
+        return self._result
+
+    @property
+    def skip_rate(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def report(self):
+        return f"{self.skipped}/{self.frames} frames skipped ({self.skip_rate:.0%})"
+
+# -------------------------------------------------
+# Calibration
+# -------------------------------------------------
+def calibrate(samples):
+    """Learn thresholds from (label, BGR frame) pairs; returns the new thresholds.
+
+    label is 'correct', 'incorrect' or anything else for neutral frames.
+    The banner threshold is placed halfway between the weakest reveal and
+    the strongest non-reveal frame; the icon gain at a third of the
+    weakest icon share seen on correct frames.
+    """
+    t = dict(thresholds())
+    feats = [(label, features(img)) for label, img in samples]
+
+    reveal = [max(g, r) for label, (g, r, _) in feats if label in ("correct", "incorrect")]
+    other = [max(g, r) for label, (g, r, _) in feats if label not in ("correct", "incorrect")]
+    if reveal and other and min(reveal) > max(other):
+        t["banner"] = round((min(reveal) + max(other)) / 2, 4)
+    elif reveal:
+        t["banner"] = round(min(reveal) * 0.8, 4)
+
+    icons = [i for label, (_, _, i) in feats if label == "correct"]
+    base = [i for label, (_, _, i) in feats if label != "correct"]
+    if icons:
+        floor = max(base) if base else 0.0
+        t["icon_gain"] = round(max((min(icons) - floor) / 3, 0.001), 4)
+
+    with open(CALIBRATION_FILE, "w", encoding="utf-8") as f:
+        json.dump(t, f, indent=2)
+
+    global _thresholds
+    _thresholds = t
+    return t
+
+def _cli(argv):
+    if len(argv) < 2 or argv[0] not in ("calibrate", "classify"):
+        print(__doc__)
+        return
+
+    if argv[0] == "classify":
+        for path in argv[1:]:
+            img = read_frame(path)
+            if img is None:
+                print(f"{path}: unreadable")
+                continue
+            t0 = time.perf_counter()
+            for _ in range(100):
+                res = classify(img)
+            per = (time.perf_counter() - t0) / 100 * 1000
+            print(f"{path}: {res.label}  green={res.banner_green:.3f} red={res.banner_red:.3f} "
+                  f"icon={res.icon_green:.4f}  ({per:.3f} ms/frame)")
+        return
+
+    samples = []
+    for arg in argv[1:]:
+        label, _, path = arg.partition(":")
+        if label not in ("correct", "incorrect", "other"):
+            label, path = "other", arg    # plain path (possibly with a drive letter)
+        img = read_frame(path)
+        if img is None:
+            print(f"{path}: unreadable, skipped")
+            continue
+        samples.append((label, img))
+    t = calibrate(samples)
+    print(f"Saved {CALIBRATION_FILE}: banner={t['banner']} icon_gain={t['icon_gain']}")
+
+# -------------------------------------------------
+if __name__ == "__main__":
+    _cli(sys.argv[1:])
@@ -0,0 +1,133 @@
+"""
+Cached WebDriver binary resolution.
+
+ChromeDriverManager().install() / GeckoDriverManager().install() ask the
+network for the latest driver on every start. resolve_driver() instead
+reads the installed browser version locally (registry or --version) and
+returns the last known-good driver path from DRIVER_CACHE_FILE when its
+major version still matches; the driver manager only runs when there is
+no usable driver at all or the browser's major version moved.
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+
+DRIVER_CACHE_FILE = "driver_cache.json"
+
+DRIVER_NAMES = {"chrome": "chromedriver", "firefox": "geckodriver"}
+
+_lock = threading.Lock()
+
+# -------------------------------------------------
+def _load():
+    try:
+        with open(DRIVER_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _store(browser, path, version):
+    with _lock:
+        data = _load()
+        data[browser] = {"path": path, "browser_version": version}
+        with open(DRIVER_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+def _major(version):
+    return version.split(".")[0] if version else None
+
+# -------------------------------------------------
+# Installed browser version (no network)
+# -------------------------------------------------
+def _registry_version(key_path, value_name):
+    import winreg
+    for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+        try:
+            with winreg.OpenKey(hive, key_path) as key:
+                return str(winreg.QueryValueEx(key, value_name)[0])
+        except OSError:
+            continue
+    return None
+
+BROWSER_CANDIDATES = {
+    "chrome": [
+        r"%ProgramFiles%\Google\Chrome\Application\chrome.exe",
+        r"%ProgramFiles(x86)%\Google\Chrome\Application\chrome.exe",
+        r"%LOCALAPPDATA%\Google\Chrome\Application\chrome.exe",
+        "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+        "google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+    ],
+    "firefox": [
+        r"%ProgramFiles%\Mozilla Firefox\firefox.exe",
+        r"%ProgramFiles(x86)%\Mozilla Firefox\firefox.exe",
+        "/Applications/Firefox.app/Contents/MacOS/firefox",
+        "firefox",
+    ],
+}
+
+def browser_binary(browser):
+    """Return the path of the installed browser executable, or None."""
+    for exe in BROWSER_CANDIDATES[browser]:
+        expanded = os.path.expandvars(exe)
+        path = expanded if os.path.isabs(expanded) else shutil.which(expanded)
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+def browser_version(browser):
+    """Return the installed browser version string, or None if unknown."""
+    try:
+        if os.name == "nt":
+            if browser == "chrome":
+                v = _registry_version(r"Software\Google\Chrome\BLBeacon", "version")
+            else:
+                v = _registry_version(r"SOFTWARE\Mozilla\Mozilla Firefox", "CurrentVersion")
+            if v:
+                return re.search(r"[\d.]+", v).group(0)
+
+        path = browser_binary(browser)
+        if path:
+            out = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=5).stdout
+            m = re.search(r"(\d+(?:\.\d+)+)", out)
+            if m:
+                return m.group(1)
+    except Exception:
+        pass
+    return None
+
+# -------------------------------------------------
+def _install(browser):
+    """Download/locate the driver via webdriver_manager (may hit the network)."""
+    if browser == "chrome":
+        from webdriver_manager.chrome import ChromeDriverManager
+        return ChromeDriverManager().install()
+    from webdriver_manager.firefox import GeckoDriverManager
+    return GeckoDriverManager().install()
+
+def resolve_driver(browser):
+    """Return a path to a driver binary for 'chrome' or 'firefox'.
+
+    The installed browser version (registry / --version, no network) is
+    checked against the cache first, so a browser update never launches
+    with a stale driver.
+    """
+    version = browser_version(browser)
+    entry = _load().get(browser)
+    if entry and os.path.isfile(entry.get("path", "")):
+        if version is None or _major(version) == _major(entry.get("browser_version")):
+            return entry["path"]
+        print(f"ℹ️ {browser} updated to {version}; resolving a matching driver...")
+        try:
+            path = _install(browser)
+        except Exception as e:
+            print(f"ℹ️ Driver refresh for {browser} {version} failed (offline?): {e}")
+            return entry["path"]
+        _store(browser, path, version)
+        return path
+
+    path = shutil.which(DRIVER_NAMES[browser]) or _install(browser)
+    _store(browser, path, version)
+    return path
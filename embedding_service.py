@@ -0,0 +1,358 @@
+"""
+Shared sentence-embedding service and quantized vector index for the RAG store.
+
+EmbeddingService loads one SentenceTransformer per process. embed() may be
+called from any thread: requests are queued and a worker coalesces them into
+batches of up to BATCH_SIZE texts (waiting at most BATCH_WAIT for more), so
+all pages fetched for a question - and questions asked concurrently, e.g.
+by evaluate.py - go through the model together. Torch uses every core, and
+batches of MULTIPROCESS_MIN texts or more are spread over a multi-process
+pool.
+
+QuantizedIndex stores vectors as int8 (per-vector scale) or float16 instead
+of float32, next to a JSON file of ids, documents and metadata, with
+changes appended to a journal that is compacted only once it outgrows the
+base. It answers the subset of Chroma's collection API that rag.py uses
+(add / get / update / delete / query / count), so it can stand in for a
+collection. Queries score every vector with the quantized query, then
+re-rank the best n_results * RERANK_FACTOR candidates exactly against the
+float32 query.
+"""
+import atexit
+import base64
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+import append_log
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+BATCH_SIZE = 64
+BATCH_WAIT = 0.005        # seconds to wait for more texts before encoding
+MULTIPROCESS_MIN = 512    # texts in one batch before the process pool pays off
+RERANK_FACTOR = 4
+SCORE_CHUNK = 4096        # rows upcast at a time during coarse scoring
+COMPACT_MIN_BYTES = 4 * 1024 * 1024   # journal size before it is worth folding into the base
+
+# -------------------------------------------------
+class EmbeddingService:
+    def __init__(self, model_name=EMBED_MODEL, batch_size=BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.texts = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self._model = None
+        self._pool = None
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _load(self):
+        if self._model is None:
+            import torch
+            from sentence_transformers import SentenceTransformer
+            torch.set_num_threads(os.cpu_count() or 1)
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def _encode(self, texts):
+        model = self._load()
+        if len(texts) >= MULTIPROCESS_MIN and (os.cpu_count() or 1) > 1:
+            if self._pool is None:
+                self._pool = model.start_multi_process_pool()
+                atexit.register(model.stop_multi_process_pool, self._pool)
+            vecs = model.encode_multi_process(texts, self._pool, batch_size=self.batch_size)
+            vecs = np.asarray(vecs, dtype=np.float32)
+            norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+            return vecs / np.where(norms == 0, 1, norms)
+        return model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                            convert_to_numpy=True, show_progress_bar=False)
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            count = len(jobs[0][0])
+            deadline = time.perf_counter() + BATCH_WAIT
+            while count < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                jobs.append(job)
+                count += len(job[0])
+
+            texts = [t for job_texts, _ in jobs for t in job_texts]
+            t0 = time.perf_counter()
+            try:
+                vecs = np.asarray(self._encode(texts), dtype=np.float32)
+            except Exception as e:
+                for _, fut in jobs:
+                    fut.set_exception(e)
+                continue
+            self.seconds += time.perf_counter() - t0
+            self.texts += len(texts)
+            self.batches += 1
+
+            i = 0
+            for job_texts, fut in jobs:
+                fut.set_result(vecs[i:i + len(job_texts)])
+                i += len(job_texts)
+
+    def embed(self, texts):
+        """Return an (n, dim) float32 array of unit-length embeddings."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        fut = Future()
+        self._queue.put((texts, fut))
+        return fut.result()
+
+    def report(self):
+        rate = self.texts / self.seconds if self.seconds else 0.0
+        return f"{self.texts} texts in {self.batches} batches ({rate:.0f} texts/s)"
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+    return _service
+
+# -------------------------------------------------
+# Quantization
+# -------------------------------------------------
+def quantize(vecs, dtype="int8"):
+    """Return (quantized vectors, per-vector float32 scales)."""
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if dtype == "float16":
+        return vecs.astype(np.float16), np.ones(len(vecs), dtype=np.float32)
+    scale = np.abs(vecs).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    q = np.clip(np.rint(vecs / scale[:, None]), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+def dequantize(q, scale):
+    return q.astype(np.float32) * scale[:, None]
+
+class QuantizedIndex:
+    """Chroma-collection look-alike backed by int8/float16 .npy files.
+
+    A compacted base (vectors / scales / records of one generation) plus an
+    append-only journal of adds, updates and deletes since then. Writes
+    only append to the journal; once it outgrows the base (and
+    COMPACT_MIN_BYTES), compact() folds it into a new generation, so each
+    stored row is rewritten O(1) times on average. manifest.json names the
+    current generation and is replaced last, so a crash mid-compaction
+    leaves the previous generation and its journal intact.
+    """
+
+    def __init__(self, path, dtype="int8"):
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._ids, self._docs, self._metas = [], [], []
+        self._vectors = None
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._generation = 0
+        self._base_bytes = 0
+        self._journal_bytes = 0
+        os.makedirs(path, exist_ok=True)
+        try:
+            with open(self._file("manifest.json"), "r", encoding="utf-8") as f:
+                self._generation = json.load(f)["generation"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+        self._load_base()
+        self._replay()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _base_files(self, generation):
+        # Generation 0 keeps the original file names, so older stores load as is.
+        suffix = f"-{generation}" if generation else ""
+        return [f"records{suffix}.json", f"vectors{suffix}.npy", f"scales{suffix}.npy"]
+
+    def _journal(self, generation=None):
+        return self._file(f"journal-{self._generation if generation is None else generation}.jsonl")
+
+    def _load_base(self):
+        records_name, vectors_name, scales_name = self._base_files(self._generation)
+        try:
+            with open(self._file(records_name), "r", encoding="utf-8") as f:
+                records = json.load(f)
+            vectors = np.load(self._file(vectors_name))
+            scales = np.load(self._file(scales_name))
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError):
+            return
+        if len(vectors) == len(scales) == len(records["ids"]):
+            self._vectors, self._scales = vectors, scales
+            self._ids = records["ids"]
+            self._docs = records["documents"]
+            self._metas = records["metadatas"]
+            self._base_bytes = sum(os.path.getsize(self._file(n)) for n in self._base_files(self._generation))
+
+    def _replay(self):
+        ops, self._journal_bytes = append_log.replay(self._journal(), repair=True)
+        for op in ops:
+            self._apply(op)
+
+    def _apply(self, op):
+        if op["op"] == "add":
+            vecs = np.frombuffer(base64.b64decode(op["vectors"]), dtype=self.dtype)
+            self._append_rows(op["ids"], op["documents"], op["metadatas"],
+                              vecs.reshape(len(op["ids"]), -1), np.asarray(op["scales"], dtype=np.float32))
+        elif op["op"] == "update":
+            self._update_rows(op["ids"], op["metadatas"])
+        elif op["op"] == "delete":
+            self._delete_rows(op["ids"])
+
+    def _log(self, op):
+        """Append one operation to the journal and compact when it has outgrown the base."""
+        self._journal_bytes += append_log.append(self._journal(), [op])
+        if self._journal_bytes > max(COMPACT_MIN_BYTES, self._base_bytes):
+            self._compact()
+
+    def _compact(self):
+        generation = self._generation + 1
+        names = self._base_files(generation)
+
+        def write(name, fn):
+            tmp = self._file(name + ".tmp")
+            with open(tmp, "wb") as f:
+                fn(f)
+            os.replace(tmp, self._file(name))
+
+        records = {"ids": self._ids, "documents": self._docs, "metadatas": self._metas}
+        vectors = self._vectors if self._vectors is not None else np.zeros((0, 0), dtype=self.dtype)
+        write(names[0], lambda f: f.write(json.dumps(records).encode("utf-8")))
+        write(names[1], lambda f: np.save(f, vectors))
+        write(names[2], lambda f: np.save(f, self._scales))
+        write("manifest.json", lambda f: f.write(json.dumps({"generation": generation}).encode("utf-8")))
+
+        old = self._base_files(self._generation) + [os.path.basename(self._journal())]
+        self._generation = generation
+        self._base_bytes = sum(os.path.getsize(self._file(n)) for n in names)
+        self._journal_bytes = 0
+        for name in old:
+            try:
+                os.remove(self._file(name))
+            except OSError:
+                pass
+
+    def compact(self):
+        """Fold the journal into a fresh base now (e.g. after a large eviction)."""
+        with self._lock:
+            if self._journal_bytes:
+                self._compact()
+
+    # -- in-memory rows ------------------------------------------------
+    def _append_rows(self, ids, documents, metadatas, q, scale):
+        self._ids.extend(ids)
+        self._docs.extend(documents)
+        self._metas.extend(metadatas)
+        self._vectors = q if self._vectors is None or not len(self._vectors) else np.concatenate([self._vectors, q])
+        self._scales = np.concatenate([self._scales, scale])
+
+    def _update_rows(self, ids, metadatas):
+        pos = {x: i for i, x in enumerate(self._ids)}
+        for id_, meta in zip(ids, metadatas):
+            if id_ in pos:
+                self._metas[pos[id_]].update(meta)
+
+    def _delete_rows(self, ids):
+        drop = set(ids)
+        keep = [i for i, x in enumerate(self._ids) if x not in drop]
+        self._ids = [self._ids[i] for i in keep]
+        self._docs = [self._docs[i] for i in keep]
+        self._metas = [self._metas[i] for i in keep]
+        if self._vectors is not None:
+            self._vectors = self._vectors[keep]
+            self._scales = self._scales[keep]
+
+    # -- collection API ---------------------------------------------
+    def count(self):
+        return len(self._ids)
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        q, scale = quantize(embeddings, self.dtype)
+        documents = list(documents or [""] * len(ids))
+        metadatas = list(metadatas or [{} for _ in ids])
+        with self._lock:
+            self._append_rows(list(ids), documents, metadatas, q, scale)
+            self._log({"op": "add", "ids": list(ids), "documents": documents, "metadatas": metadatas,
+                       "vectors": base64.b64encode(q.tobytes()).decode("ascii"),
+                       "scales": scale.tolist()})
+
+    def get(self, ids=None, include=None):
+        with self._lock:
+            wanted = None if ids is None else set(ids)
+            rows = [i for i, x in enumerate(self._ids) if wanted is None or x in wanted]
+            out = {
+                "ids": [self._ids[i] for i in rows],
+                "documents": [self._docs[i] for i in rows],
+                "metadatas": [self._metas[i] for i in rows],
+            }
+            if include and "embeddings" in include and self._vectors is not None:
+                out["embeddings"] = dequantize(self._vectors[rows], self._scales[rows])
+            return out
+
+    def update(self, ids, metadatas):
+        with self._lock:
+            self._update_rows(ids, metadatas)
+            self._log({"op": "update", "ids": list(ids), "metadatas": list(metadatas)})
+
+    def delete(self, ids):
+        with self._lock:
+            self._delete_rows(ids)
+            self._log({"op": "delete", "ids": list(ids)})
+
+    def query(self, query_embeddings, n_results=3, include=None):
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            if self._vectors is None or not self._ids:
+                for key in out:
+                    out[key] = [[] for _ in query_embeddings]
+                return out
+            queries = np.asarray(query_embeddings, dtype=np.float32)
+            qq, qs = quantize(queries, self.dtype)
+            qq = qq.astype(np.float32)
+
+            # Coarse pass: quantized query vs quantized vectors, in chunks so
+            # only SCORE_CHUNK rows are ever upcast at once.
+            coarse = np.empty((len(self._ids), len(queries)), dtype=np.float32)
+            for start in range(0, len(self._ids), SCORE_CHUNK):
+                block = self._vectors[start:start + SCORE_CHUNK].astype(np.float32)
+                coarse[start:start + len(block)] = block @ qq.T
+            coarse *= self._scales[:, None] * qs[None, :]
+
+            k = min(n_results, len(self._ids))
+            pool = min(k * RERANK_FACTOR, len(self._ids))
+            for j, query in enumerate(queries):
+                cand = np.argpartition(-coarse[:, j], pool - 1)[:pool]
+                # Re-rank: full-precision query against the candidates.
+                exact = dequantize(self._vectors[cand], self._scales[cand]) @ query
+                best = cand[np.argsort(-exact)[:k]]
+                sims = np.sort(exact)[::-1][:k]
+                out["ids"].append([self._ids[i] for i in best])
+                out["documents"].append([self._docs[i] for i in best])
+                out["metadatas"].append([self._metas[i] for i in best])
+                out["distances"].append([float(1.0 - s) for s in sims])
+        return out
+
+    def disk_bytes(self):
+        with self._lock:
+            return self._base_bytes + self._journal_bytes
@@ -0,0 +1,241 @@
+"""
+Offline batch evaluation of the answer backends.
+
+Replays every entry in kahoot_cache.json through one backend and reports
+accuracy, p50/p95 latency and tokens per question.
+
+    python evaluate.py --backend ollama --concurrency 4
+    python evaluate.py --backend gemini --offline
+    python evaluate.py --backend rag --offline --standin-accuracy 0.7
+
+Backends:
+    ollama  the ai_guess prompt sent straight to Ollama (no retrieval)
+    rag     the same prompt through rag.ask_with_rag, as autoanswer.ai_guess does
+    gemini  ask_gemini from "simpler one/gemini_client.py"
+
+--offline swaps Ollama and Gemini for local stand-ins that answer from
+the cache itself with a configurable accuracy and latency, so the whole
+harness (prompting, parsing, threading, reporting) runs without network.
+The rag backend still needs chromadb and the embedding model locally; its
+web search simply finds nothing when offline.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from answer_parser import build_guess_prompt, parse_answer, parse_guess
+from kahoot_cache import CACHE_FILE, is_verified, load_cache
+from tracing import percentile
+
+GEMINI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simpler one")
+
+# -------------------------------------------------
+def load_quiz(path=CACHE_FILE):
+    """Cache entries usable as ground truth (precomputed model guesses are not)."""
+    cache = load_cache(path, readonly=True)
+    return [e for e in cache.values()
+            if e.get("answers") and e.get("correct") in e["answers"] and is_verified(e)]
+
+# -------------------------------------------------
+# Stand-ins
+# -------------------------------------------------
+class Oracle:
+    """Answers quiz prompts from the cache with a fixed accuracy."""
+
+    def __init__(self, quiz, accuracy=0.8, latency=0.3, seed=0):
+        self.by_question = {e["question"].strip(): e for e in quiz}
+        self.accuracy = accuracy
+        self.latency = latency
+        self.seed = seed
+
+    def answer(self, prompt):
+        entry = None
+        for m in re.finditer(r"Question:\s*(.+)", prompt):
+            entry = self.by_question.get(m.group(1).strip())
+            if entry:
+                break
+
+        time.sleep(max(0.0, random.gauss(self.latency, self.latency / 4)))
+        if entry is None:
+            return "I don't know."
+
+        answers = entry["answers"]
+        right = answers.index(entry["correct"]) if entry["correct"] in answers else 0
+        rng = random.Random(f"{self.seed}|{entry['question']}")
+        if rng.random() < self.accuracy or len(answers) == 1:
+            idx = right
+        else:
+            idx = rng.choice([i for i in range(len(answers)) if i != right])
+        return chr(65 + idx)
+
+def start_ollama_standin(oracle):
+    """Serve a minimal /api/chat and /api/generate on localhost; returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            generate = self.path.endswith("/api/generate")
+            if generate:
+                prompt = body.get("prompt", "")
+            else:
+                prompt = "\n".join(m["content"] for m in body.get("messages", []))
+            text = oracle.answer(prompt)
+            # Real Ollama only prefills the uncached suffix; for quiz calls that is the prompt.
+            done = {"done": True, "prompt_eval_count": len(prompt) // 4, "eval_count": 1}
+
+            if generate and not body.get("stream", True):
+                self._send("application/json", [dict(done, response=text, context=[0])])
+                return
+            if generate:
+                chunks = [{"response": text, "done": False}, dict(done, response="", context=[0])]
+            else:
+                chunks = [
+                    {"message": {"role": "assistant", "content": text}, "done": False},
+                    dict(done, message={"role": "assistant", "content": ""}),
+                ]
+            self._send("application/x-ndjson", chunks)
+
+        def _send(self, content_type, chunks):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.end_headers()
+            for c in chunks:
+                self.wfile.write((json.dumps(c) + "\n").encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class GeminiStandin:
+    """Drop-in for genai.Client as used by gemini_client._generate."""
+
+    def __init__(self, oracle):
+        self.models = self
+        self.oracle = oracle
+
+    def generate_content(self, model, contents, config):
+        if isinstance(contents, list):
+            contents = "\n".join(c for c in contents if isinstance(c, str))
+        prompt = contents.replace("Question:\n", "Question: ")
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=1)
+        return SimpleNamespace(text=self.oracle.answer(prompt), usage_metadata=usage)
+
+# -------------------------------------------------
+# Backends: each returns (answer_index_or_None, stats)
+# -------------------------------------------------
+def make_backend(name, oracle=None):
+    if name in ("ollama", "rag"):
+        import ollama_client
+        if oracle is not None:
+            server = start_ollama_standin(oracle)
+            ollama_client.OLLAMA_URL = f"http://127.0.0.1:{server.server_address[1]}"
+
+        if name == "rag":
+            import rag
+
+            def run(question, answers):
+                stats = {}
+                query = question + "\n" + "\n".join(answers)
+                text = rag.ask_with_rag(build_guess_prompt(question, answers), stats=stats,
+                                        query=query, quiz=True)
+                return parse_guess(text, answers), stats
+        else:
+            def run(question, answers):
+                stats = {}
+                text = ollama_client.ollama_quiz(build_guess_prompt(question, answers), stats=stats)
+                return parse_guess(text, answers), stats
+        return run
+
+    if name == "gemini":
+        sys.path.insert(0, GEMINI_DIR)
+        import gemini_client
+        if oracle is not None:
+            gemini_client._client = GeminiStandin(oracle)
+
+        def run(question, answers):
+            stats = {}
+            text = gemini_client.ask_gemini(question, answers, stats=stats) or ""
+            return parse_answer(text, answers), stats
+        return run
+
+    raise ValueError(f"Unknown backend: {name}")
+
+# -------------------------------------------------
+def evaluate(quiz, run, concurrency=1):
+    def one(entry):
+        t0 = time.perf_counter()
+        try:
+            idx, stats = run(entry["question"], entry["answers"])
+            error = None
+        except Exception as e:
+            idx, stats, error = None, {}, str(e)
+        elapsed = time.perf_counter() - t0
+        picked = entry["answers"][idx] if idx is not None and 0 <= idx < len(entry["answers"]) else None
+        return {
+            "question": entry["question"],
+            "picked": picked,
+            "correct": picked == entry["correct"],
+            "latency": elapsed,
+            "tokens": stats.get("prompt_tokens", 0) + stats.get("completion_tokens", 0),
+            "error": error,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        return list(pool.map(one, quiz))
+
+def report(results, backend, wall):
+    n = len(results)
+    if not n:
+        print("No cached questions to evaluate.")
+        return
+    lat = [r["latency"] for r in results]
+    print(f"\n=== {backend}: {n} questions in {wall:.1f}s ===")
+    print(f"accuracy     {sum(r['correct'] for r in results) / n:6.1%}")
+    print(f"unparsed     {sum(r['picked'] is None for r in results):6d}")
+    print(f"errors       {sum(r['error'] is not None for r in results):6d}")
+    print(f"latency p50  {percentile(lat, 50) * 1000:6.0f} ms")
+    print(f"latency p95  {percentile(lat, 95) * 1000:6.0f} ms")
+    print(f"tokens/q     {sum(r['tokens'] for r in results) / n:6.1f}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay kahoot_cache.json through an answer backend.")
+    ap.add_argument("--backend", choices=["ollama", "rag", "gemini"], default="ollama")
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--limit", type=int, default=0, help="only the first N questions")
+    ap.add_argument("--cache", default=CACHE_FILE)
+    ap.add_argument("--offline", action="store_true", help="use local stand-ins instead of Ollama/Gemini")
+    ap.add_argument("--standin-accuracy", type=float, default=0.8)
+    ap.add_argument("--standin-latency", type=float, default=0.3, help="mean seconds per answer")
+    ap.add_argument("--out", help="write per-question results as JSONL")
+    args = ap.parse_args()
+
+    quiz = load_quiz(args.cache)
+    if args.limit:
+        quiz = quiz[:args.limit]
+
+    oracle = Oracle(quiz, args.standin_accuracy, args.standin_latency) if args.offline else None
+    run = make_backend(args.backend, oracle)
+
+    t0 = time.perf_counter()
+    results = evaluate(quiz, run, args.concurrency)
+    report(results, args.backend, time.perf_counter() - t0)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+# -------------------------------------------------
+if __name__ == "__main__":
+    main()
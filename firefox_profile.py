@@ -0,0 +1,175 @@
+"""
+Minimal Firefox automation profile cloned from the user's real profile.
+
+Pointing Selenium (or firefox -profile) at the full default profile drags
+caches, history and session files along on every start. build_slim_profile()
+copies only what the Kahoot session needs (cookies, prefs, certs, Kahoot's
+site storage) into SLIM_PROFILE_DIR once, and on later runs re-copies just
+the files whose size or mtime changed in the source profile, so startup
+I/O no longer grows with the size of the user's profile.
+"""
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+SLIM_PROFILE_DIR = "firefox_automation_profile"
+MANIFEST_FILE = ".slim_manifest.json"
+
+# Top-level profile files worth keeping. Saved passwords (logins.json) and
+# their key (key4.db) stay out: the clone is driven over an open Marionette port.
+KEEP_FILES = [
+    "prefs.js",
+    "cookies.sqlite",
+    "permissions.sqlite",
+    "cert9.db",
+    "containers.json",
+    "webappsstore.sqlite",
+]
+# Site storage (localStorage / IndexedDB) under storage/default/ for these hosts.
+KEEP_SITES = ["kahoot.it", "kahoot.com"]
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+# Appended to the slim profile's user.js.
+AUTOMATION_PREFS = {
+    "browser.startup.page": 1,
+    "browser.startup.homepage": "https://kahoot.it/",
+    "dom.webnotifications.enabled": False,
+    "browser.shell.checkDefaultBrowser": False,
+    "browser.aboutwelcome.enabled": False,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "browser.cache.disk.enable": False,       # keep the clone small
+    "browser.sessionstore.resume_from_crash": False,
+}
+
+# -------------------------------------------------
+def _wanted_files(source):
+    """Yield profile-relative paths to copy."""
+    for name in KEEP_FILES:
+        if os.path.isfile(os.path.join(source, name)):
+            yield name
+
+    storage = os.path.join(source, "storage", "default")
+    if not os.path.isdir(storage):
+        return
+    for site in os.listdir(storage):
+        if not any(host in site for host in KEEP_SITES):
+            continue
+        for root, _, files in os.walk(os.path.join(storage, site)):
+            for f in files:
+                if f.endswith(("-wal", "-shm", "-journal")):
+                    continue    # folded into the .sqlite copy by the backup API
+                yield os.path.relpath(os.path.join(root, f), source)
+
+def _is_sqlite(path):
+    """By header, so cert9.db and IndexedDB files without .sqlite count too."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+def _copy(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if not _is_sqlite(src):
+        shutil.copy2(src, dst)
+        return
+    # The backup API gives a consistent copy (WAL included) even while the
+    # user's Firefox has the database open. It goes to a temp file first so
+    # a failed backup never leaves a torn database behind; there is no raw
+    # copy fallback, since copying a database in use is what tears it.
+    tmp = dst + ".tmp"
+    s = d = None
+    error = None
+    try:
+        s = sqlite3.connect(Path(src).resolve().as_uri() + "?mode=ro", uri=True)
+        d = sqlite3.connect(tmp)
+        s.backup(d)
+    except sqlite3.Error as e:
+        error = e
+    finally:
+        for conn in (s, d):
+            if conn is not None:
+                conn.close()
+    if error is not None:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise OSError(f"sqlite backup failed ({error}); keeping the previous copy")
+    os.replace(tmp, dst)
+
+def _write_user_js(source, dest):
+    lines = []
+    src_user = os.path.join(source, "user.js")
+    if os.path.isfile(src_user):
+        with open(src_user, "r", encoding="utf-8", errors="replace") as f:
+            lines.append(f.read().rstrip("\n"))
+    for key, value in AUTOMATION_PREFS.items():
+        lines.append(f'user_pref("{key}", {json.dumps(value)});')
+    text = "\n".join(lines) + "\n"
+
+    path = os.path.join(dest, "user.js")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return
+    except FileNotFoundError:
+        pass
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+# -------------------------------------------------
+def build_slim_profile(source, dest=SLIM_PROFILE_DIR):
+    """Create or incrementally refresh the slim clone of `source`; returns its path."""
+    from browser_session import session_running
+
+    dest = os.path.abspath(dest)
+    if os.path.isdir(dest) and session_running("firefox"):
+        # The persistent Firefox has these databases open; leave them alone.
+        print("🦊 Slim profile in use by the running Firefox; not refreshing it.")
+        return dest
+    os.makedirs(dest, exist_ok=True)
+    manifest_path = os.path.join(dest, MANIFEST_FILE)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    new_manifest = {}
+    copied = 0
+    copied_bytes = 0
+    for rel in _wanted_files(source):
+        src = os.path.join(source, rel)
+        try:
+            st = os.stat(src)
+        except OSError:
+            continue
+        sig = [st.st_size, st.st_mtime_ns]
+        dst = os.path.join(dest, rel)
+        if manifest.get(rel) != sig or not os.path.exists(dst):
+            try:
+                _copy(src, dst)
+            except OSError as e:
+                print(f"⚠️ Could not refresh {rel}: {e}")
+                if rel in manifest:
+                    new_manifest[rel] = manifest[rel]
+                continue
+            copied += 1
+            copied_bytes += st.st_size
+        new_manifest[rel] = sig
+
+    # Drop files that disappeared from the source profile.
+    for rel in set(manifest) - set(new_manifest):
+        try:
+            os.remove(os.path.join(dest, rel))
+        except OSError:
+            pass
+
+    _write_user_js(source, dest)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(new_manifest, f)
+
+    print(f"🦊 Slim profile: {copied} file(s) refreshed ({copied_bytes / 1e6:.1f} MB), "
+          f"{len(new_manifest) - copied} unchanged")
+    return dest
@@ -3,7 +3,7 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from driver_resolver import resolve_driver
 
 # -------------------------------------------------
 CHATGPT_URL = "https://chat.openai.com/"
@@ -15,7 +15,7 @@ def main():
     # --- Launch Chrome ---
     opts = Options()
     opts.add_argument("--start-maximized")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
+    driver = webdriver.Chrome(service=Service(resolve_driver("chrome")), options=opts)
 
     # --- Open ChatGPT page ---
     print(f"Opening {CHATGPT_URL} ...")
@@ -0,0 +1,159 @@
+"""
+Hybrid BM25 + vector retrieval over the RAG page store.
+
+Pages are stored as passages of about PASSAGE_WORDS words (see
+split_passages), so both retrievers work at passage level:
+
+    1. dense   the store's vector query (top CANDIDATES)
+    2. sparse  an in-process BM25 inverted index over the same passages,
+               built lazily from the store and kept in step with adds and
+               evictions
+    3. merge   reciprocal-rank fusion (RRF_K) of the two lists
+    4. rerank  fused candidates rescored by cosine similarity to the query
+               plus BM25_WEIGHT x normalised BM25 score
+
+Only the best passages that fit in `token_budget` (count_tokens) are
+returned; context_budget.assemble() then trims them to sentences.
+"""
+import math
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from context_budget import count_tokens, tokenize
+
+PASSAGE_WORDS = 120
+PASSAGE_OVERLAP = 20
+CANDIDATES = 8
+RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_WEIGHT = 0.3
+CONTEXT_TOKENS = 512
+
+# -------------------------------------------------
+def split_passages(text, size=PASSAGE_WORDS, overlap=PASSAGE_OVERLAP):
+    words = text.split()
+    if len(words) <= size:
+        return [text] if words else []
+    step = size - overlap
+    return [" ".join(words[i:i + size]) for i in range(0, len(words) - overlap, step)]
+
+def best_window(text, terms, size=PASSAGE_WORDS):
+    """Passage of `text` with the most query-term hits (for long, unsplit documents)."""
+    passages = split_passages(text, size)
+    if len(passages) <= 1:
+        return text
+    return max(passages, key=lambda p: sum(1 for w in tokenize(p) if w in terms))
+
+# -------------------------------------------------
+class BM25Index:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = defaultdict(dict)   # term -> {doc_id: tf}
+        self.lengths = {}                   # doc_id -> token count
+        self.terms = {}                     # doc_id -> distinct terms, for removal
+        self.total = 0
+
+    def add(self, ids, documents):
+        with self._lock:
+            for id_, doc in zip(ids, documents):
+                if id_ in self.lengths:
+                    continue
+                tokens = tokenize(doc or "")
+                counts = Counter(tokens)
+                for term, tf in counts.items():
+                    self.postings[term][id_] = tf
+                self.terms[id_] = list(counts)
+                self.lengths[id_] = len(tokens)
+                self.total += len(tokens)
+
+    def remove(self, ids):
+        with self._lock:
+            for id_ in ids:
+                length = self.lengths.pop(id_, None)
+                if length is None:
+                    continue
+                self.total -= length
+                for term in self.terms.pop(id_):
+                    docs = self.postings[term]
+                    docs.pop(id_, None)
+                    if not docs:
+                        del self.postings[term]
+
+    def search(self, query, k=CANDIDATES):
+        """Return [(doc_id, score)] best first."""
+        with self._lock:
+            n = len(self.lengths)
+            if n == 0:
+                return []
+            avg = self.total / n or 1.0
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for id_, tf in docs.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[id_] / avg)
+                    scores[id_] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+# -------------------------------------------------
+class HybridRetriever:
+    def __init__(self, store):
+        self.store = store
+        self.bm25 = None
+
+    def _ensure_bm25(self):
+        if self.bm25 is None:
+            data = self.store.get(include=["documents"])
+            bm25 = BM25Index()
+            bm25.add(data["ids"], data["documents"])
+            self.bm25 = bm25
+        return self.bm25
+
+    def added(self, ids, documents):
+        if self.bm25 is not None:
+            self.bm25.add(ids, documents)
+
+    def removed(self, ids):
+        if self.bm25 is not None:
+            self.bm25.remove(ids)
+
+    def retrieve(self, query, query_vec, token_budget=CONTEXT_TOKENS):
+        """Return [(id, passage, metadata)] best first, within `token_budget`."""
+        dense = self.store.query(query_embeddings=[query_vec.tolist()], n_results=CANDIDATES)
+        dense_ids = dense["ids"][0] if dense["ids"] else []
+        sparse = self._ensure_bm25().search(query)
+
+        fused = defaultdict(float)
+        for rank, id_ in enumerate(dense_ids):
+            fused[id_] += 1.0 / (RRF_K + rank + 1)
+        for rank, (id_, _) in enumerate(sparse):
+            fused[id_] += 1.0 / (RRF_K + rank + 1)
+        if not fused:
+            return []
+        ids = sorted(fused, key=fused.get, reverse=True)[:CANDIDATES]
+
+        data = self.store.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        bm25 = dict(sparse)
+        top = max(bm25.values(), default=0.0) or 1.0
+        rows = []
+        for id_, doc, meta, emb in zip(data["ids"], data["documents"], data["metadatas"],
+                                       data.get("embeddings", [])):
+            cos = float(np.dot(np.asarray(emb, dtype=np.float32), query_vec))
+            rows.append((cos + BM25_WEIGHT * bm25.get(id_, 0.0) / top, id_, doc, meta))
+        rows.sort(key=lambda r: r[0], reverse=True)
+
+        terms = set(tokenize(query))
+        picked, used = [], 0
+        for _, id_, doc, meta in rows:
+            passage = best_window(doc or "", terms)
+            cost = count_tokens(passage)
+            if used + cost > token_budget:
+                continue
+            picked.append((id_, passage, meta or {}))
+            used += cost
+        return picked
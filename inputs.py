@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+# -------------------------------------------------
+# Event-driven key input for the bots.
+#
+# Key presses are pushed into a buffer by hook callbacks the moment they
+# happen, and the engine blocks on wait() instead of polling
+# keyboard.is_pressed() in a sleep loop.
+# -------------------------------------------------
+
+ANSWER = "answer"      # 1–4
+SKIP = "skip"          # F3
+CORRECT = "correct"    # Shift+1–4
+
+KEYS_ENV = "KAHOOT_KEYS"   # path of a key script; set it to run the bots without a keyboard
+
+KeyEvent = namedtuple("KeyEvent", ["kind", "index", "time"])
+
+class InputSource:
+    """Thread-safe key event buffer shared by the real and fake sources."""
+
+    def __init__(self):
+        self._events = deque()
+        self._cond = threading.Condition()
+
+    def push(self, kind, index=None):
+        with self._cond:
+            self._events.append(KeyEvent(kind, index, time.time()))
+            self._cond.notify_all()
+
+    def wait(self, kinds, timeout=None):
+        """Return the oldest event whose kind is in kinds, or None on timeout.
+
+        Events of other kinds stay buffered for whoever waits on them.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for ev in self._events:
+                    if ev.kind in kinds:
+                        self._events.remove(ev)
+                        return ev
+                if deadline is None:
+                    self._cond.wait(0.5)   # stay responsive to Ctrl+C
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def clear(self, kinds=None):
+        """Drop buffered events (of the given kinds, or all of them)."""
+        with self._cond:
+            if kinds is None:
+                self._events.clear()
+            else:
+                self._events = deque(ev for ev in self._events if ev.kind not in kinds)
+
+    def close(self):
+        pass
+
+# -------------------------------------------------
+class KeyboardInput(InputSource):
+    """Real keyboard source built on `keyboard` hotkey callbacks."""
+
+    def __init__(self, options=4):
+        super().__init__()
+        import keyboard
+        self._keyboard = keyboard
+        self._handles = []
+        for i in range(options):
+            # Plain digits only fire without Shift, so corrections never
+            # double as answers.
+            self._handles.append(keyboard.add_hotkey(str(i + 1), self.push, args=(ANSWER, i)))
+            self._handles.append(keyboard.add_hotkey(f"shift+{i + 1}", self.push, args=(CORRECT, i)))
+        self._handles.append(keyboard.add_hotkey("f3", self.push, args=(SKIP,)))
+
+    def close(self):
+        for h in self._handles:
+            try:
+                self._keyboard.remove_hotkey(h)
+            except (KeyError, ValueError):
+                pass
+        self._handles = []
+
+class FakeInput(InputSource):
+    """Scripted source for headless runs.
+
+    `script` is a list of (delay_seconds, kind, index) tuples that are
+    delivered on a background timer, relative to construction time.
+    """
+
+    def __init__(self, script=()):
+        super().__init__()
+        self._timers = []
+        for delay, kind, index in script:
+            self.feed(kind, index, delay)
+
+    def feed(self, kind, index=None, delay=0.0):
+        if delay <= 0:
+            self.push(kind, index)
+            return
+        t = threading.Timer(delay, self.push, args=(kind, index))
+        t.daemon = True
+        t.start()
+        self._timers.append(t)
+
+    def close(self):
+        for t in self._timers:
+            t.cancel()
+        self._timers = []
+
+def load_script(path):
+    """Read a key script for FakeInput.
+
+    One press per line: the delay in seconds since start, then the key as
+    it would be typed ("1"-"4", "shift+1"-"shift+4" or "f3"). Blank lines
+    and "#" comments are ignored.
+    """
+    script = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                delay, key = line.split()
+                delay = float(delay)
+                key = key.lower()
+                if key == "f3":
+                    script.append((delay, SKIP, None))
+                elif key.startswith("shift+"):
+                    script.append((delay, CORRECT, int(key[6:]) - 1))
+                else:
+                    script.append((delay, ANSWER, int(key) - 1))
+            except ValueError:
+                raise ValueError(f"{path}:{n}: expected '<seconds> <key>', got {line!r}")
+    return script
+
+def open_input(options=4):
+    """The bots' key source: the keyboard, or a FakeInput replaying the
+    script named by $KAHOOT_KEYS for headless runs."""
+    path = os.environ.get(KEYS_ENV)
+    if path:
+        print(f"⌨️ Replaying keys from {path}")
+        return FakeInput(load_script(path))
+    return KeyboardInput(options)
+
+# -------------------------------------------------
+class CorrectionWindow:
+    """Collect Shift+1–4 corrections in the background.
+
+    open(record) returns immediately. If a correction arrives before the
+    window closes, on_correction(record, index) is called from the worker
+    thread; otherwise on_expire(record) is. Opening a new window closes
+    the previous one, so a correction always lands on the latest miss.
+    """
+
+    def __init__(self, source, on_correction, on_expire=None, timeout=3.0):
+        self.source = source
+        self.on_correction = on_correction
+        self.on_expire = on_expire
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending = None     # (record, deadline)
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def open(self, record):
+        with self._lock:
+            expired = self._pending[0] if self._pending else None
+            self._pending = (record, time.monotonic() + self.timeout)
+        if expired is not None and self.on_expire:
+            self.on_expire(expired)
+
+    def close(self):
+        self._stopped = True
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        while not self._stopped:
+            ev = self.source.wait((CORRECT,), timeout=0.1)
+            now = time.monotonic()
+            with self._lock:
+                if self._pending is None:
+                    continue      # corrections outside a window are dropped
+                record, deadline = self._pending
+                live = now < deadline
+                if ev is None and live:
+                    continue
+                self._pending = None
+            if live:
+                self.on_correction(record, ev.index)
+            elif self.on_expire:
+                self.on_expire(record)
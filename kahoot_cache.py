@@ -0,0 +1,650 @@
+"""
+Answer cache shared by the bots, rag.py, evaluate.py and precompute.py.
+
+Entries are {"question", "answers", "correct", ...} keyed by make_key()
+(SHA-1 hex of the question and sorted answers), exactly as in
+kahoot_cache.json. On disk they now live in a compact snapshot next to the
+JSON file (kahoot_cache.kcs), which load_cache() memory-maps instead of
+parsing:
+
+    header      magic, version, entry count, string count, section offsets
+    key table   count x (20-byte digest, u64 record offset), sorted by digest
+                and searched by bisection straight from the mmap
+    strings     interned answer strings: (n + 1) u64 offsets + UTF-8 blob
+    records     in insertion order: digest, answer string ids, correct id,
+                question text and a JSON blob of any other fields
+
+Loading only reads the header, so it takes milliseconds whatever the size;
+records and strings are decoded when an entry is first looked up.
+save_cache() appends the entries changed since the last save to a log
+(kahoot_cache.kcs.log, one JSON line each), which loading replays; only once
+the log outgrows LOG_COMPACT_MIN and a quarter of the snapshot is the
+snapshot rewritten, copying unchanged records byte for byte.
+
+Each entry also records where its answer came from and how it has fared
+since ("source", "added", "hits", "last_hit", "confirmed", "failures",
+"fail_streak", "last_verified"). confidence() turns that into a score;
+lookup() only serves entries above MIN_CONFIDENCE, and verify() drops an
+entry once failed reveals push it below (or MAX_FAIL_STREAK come in a
+row). is_verified() tells seen-on-screen answers from model guesses. The
+per-session hit rate is in report().
+
+The JSON file remains the interchange format. It seeds the snapshot when
+there is none yet; after that the snapshot is authoritative and JSON is
+only read on request, so a pulled or checked-out kahoot_cache.json can
+never overwrite entry stats or bring back invalidated entries:
+
+    python kahoot_cache.py export [out.json]     write the cache as JSON
+    python kahoot_cache.py import [in.json]      add entries the cache lacks
+    python kahoot_cache.py import --replace [in.json]   rebuild from JSON
+    python kahoot_cache.py bench [N]             JSON vs snapshot timings
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+import append_log
+
+CACHE_FILE = "kahoot_cache.json"
+SNAPSHOT_EXT = ".kcs"
+LOG_EXT = ".log"
+LOG_COMPACT_MIN = 256 * 1024      # log bytes before folding it into the snapshot is worth it
+
+MAGIC = b"KCS1"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIQQQ")   # magic, version, count, n_strings, keys/strings/records offsets
+KEY_ROW = struct.Struct("<20sQ")      # digest, absolute record offset
+REC_HEAD = struct.Struct("<20sHIIi")  # digest, n_answers, question bytes, extra bytes, correct id
+OFFSET = struct.Struct("<Q")
+
+_BASE_FIELDS = ("question", "answers", "correct")
+
+# confidence = (prior * PRIOR_WEIGHT + confirmed) / (PRIOR_WEIGHT + confirmed + FAILURE_WEIGHT * failures)
+# With these weights a seen-on-screen answer (checkmark, export, correction,
+# legacy) survives one red reveal - a detector misread - and goes on the
+# second; a precomputed guess goes on the first unless it was confirmed.
+SOURCE_PRIOR = {
+    "checkmark": 0.95,        # our click, confirmed by the result detector
+    "export": 0.9,            # marked correct in a quiz export
+    "correction": 0.85,       # Shift+1–4 after a miss
+    "precomputed": 0.6,       # model answer, never seen on screen
+}
+LEGACY_PRIOR = 0.8            # entries saved before sources were recorded
+PRIOR_WEIGHT = 2.0
+FAILURE_WEIGHT = 1.0
+MIN_CONFIDENCE = 0.5          # below this an entry is not served and is dropped
+MAX_FAIL_STREAK = 3           # red reveals in a row that drop even a well-confirmed entry
+
+# -------------------------------------------------
+def make_key(question, answers):
+    key_text = question.strip().lower() + "|" + "|".join(sorted(a.strip().lower() for a in answers))
+    return hashlib.sha1(key_text.encode()).hexdigest()
+
+def confidence(entry):
+    prior = SOURCE_PRIOR.get(entry.get("source"), LEGACY_PRIOR)
+    confirmed = entry.get("confirmed", 0)
+    failures = entry.get("failures", 0)
+    return (prior * PRIOR_WEIGHT + confirmed) / (PRIOR_WEIGHT + confirmed + FAILURE_WEIGHT * failures)
+
+def is_verified(entry):
+    """True if the answer was seen to be right, not just guessed by a model."""
+    return entry.get("source") != "precomputed" or entry.get("confirmed", 0) > 0
+
+def answer_index(entry, answers):
+    """Index of the entry's answer among the on-screen `answers`, or None."""
+    if not entry or not entry.get("correct"):
+        return None
+    want = entry["correct"].strip().lower()
+    for i, a in enumerate(answers):
+        if a.strip().lower() == want:
+            return i
+    return None
+
+def snapshot_path(path):
+    return os.path.splitext(path)[0] + SNAPSHOT_EXT
+
+def _digest(key):
+    try:
+        digest = bytes.fromhex(key)
+    except (TypeError, ValueError):
+        digest = b""
+    if len(digest) != 20:
+        raise KeyError(f"not a cache key: {key!r}")
+    return digest
+
+def _file_id(st):
+    # A compaction writes a new file and renames it over the old one.
+    return f"{st.st_ino}-{st.st_mtime_ns}-{st.st_size}"
+
+# -------------------------------------------------
+class Snapshot:
+    """Read-only, memory-mapped view of a .kcs file."""
+
+    def __init__(self, path):
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            (magic, version, self.count, self.n_strings,
+             self.keys_off, self.strings_off, self.records_off) = HEADER.unpack_from(self._mm, 0)
+        except (ValueError, struct.error, OSError):
+            self._f.close()
+            raise ValueError(f"{path}: unreadable snapshot")
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a version {VERSION} cache snapshot")
+        self._blob_off = self.strings_off + OFFSET.size * (self.n_strings + 1)
+        self._strings = {}
+        self.id = _file_id(os.fstat(self._f.fileno()))
+
+    def close(self):
+        self._mm.close()
+        self._f.close()
+
+    def find(self, digest):
+        """Record offset for `digest`, or None (bisection over the key table)."""
+        mm, lo, hi = self._mm, 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            row = self.keys_off + mid * KEY_ROW.size
+            probe = mm[row:row + 20]
+            if probe < digest:
+                lo = mid + 1
+            elif probe > digest:
+                hi = mid
+            else:
+                return KEY_ROW.unpack_from(mm, row)[1]
+        return None
+
+    def string(self, i):
+        s = self._strings.get(i)
+        if s is None:
+            at = self.strings_off + i * OFFSET.size
+            start, end = OFFSET.unpack_from(self._mm, at)[0], OFFSET.unpack_from(self._mm, at + OFFSET.size)[0]
+            s = self._strings[i] = self._mm[self._blob_off + start:self._blob_off + end].decode("utf-8")
+        return s
+
+    def all_strings(self):
+        return [self.string(i) for i in range(self.n_strings)]
+
+    def _end(self, off):
+        _, n, qlen, xlen, _ = REC_HEAD.unpack_from(self._mm, off)
+        return off + REC_HEAD.size + 4 * n + qlen + xlen
+
+    def offsets(self):
+        """Record offsets in insertion order."""
+        off = self.records_off
+        for _ in range(self.count):
+            yield off
+            off = self._end(off)
+
+    def digest_at(self, off):
+        return self._mm[off:off + 20]
+
+    def raw(self, off):
+        return self._mm[off:self._end(off)]
+
+    def entry(self, off):
+        _, n, qlen, xlen, correct = REC_HEAD.unpack_from(self._mm, off)
+        p = off + REC_HEAD.size
+        ids = struct.unpack_from(f"<{n}I", self._mm, p)
+        p += 4 * n
+        question = self._mm[p:p + qlen].decode("utf-8")
+        p += qlen
+        entry = {
+            "question": question,
+            "answers": [self.string(i) for i in ids],
+            "correct": self.string(correct) if correct >= 0 else None,
+        }
+        if xlen:
+            entry.update(json.loads(self._mm[p:p + xlen]))
+        return entry
+
+# -------------------------------------------------
+class AnswerCache:
+    """Dict-like answer cache over a Snapshot plus in-memory changes.
+
+    Values are plain dicts; assign them back (cache[key] = entry) to
+    persist a change. Safe to use from the correction thread. A readonly
+    cache (for readers such as evaluate.py) never writes the snapshot or
+    the log, so it cannot race the bot that owns them.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._lock = threading.RLock()
+        self._snap = None
+        self._changed = {}        # key -> entry, new or modified since the last save
+        self._new = {}            # keys not in the snapshot, in insertion order
+        self._deleted = set()
+        self._decoded = {}        # read-through memo of snapshot entries
+        self._unsaved = {}        # keys changed since the last save, in order
+        self._log_path = path + LOG_EXT
+        self._log_bytes = 0
+        self.session = dict.fromkeys(
+            ("lookups", "hits", "low_confidence", "confirmed", "failed", "invalidated"), 0)
+        if os.path.exists(path):
+            self._snap = Snapshot(path)
+        self._replay()
+
+    # -- mapping API ----------------------------------------------------
+    def _snap_offset(self, key):
+        if self._snap is None or key in self._deleted:
+            return None
+        try:
+            return self._snap.find(_digest(key))
+        except KeyError:
+            return None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._changed or self._snap_offset(key) is not None
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key in self._changed:
+                return self._changed[key]
+            if key in self._decoded:
+                return self._decoded[key]
+            off = self._snap_offset(key)
+            if off is None:
+                raise KeyError(key)
+            entry = self._decoded[key] = self._snap.entry(off)
+            return entry
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, entry):
+        _digest(key)
+        with self._lock:
+            self._deleted.discard(key)
+            if key not in self._changed and self._snap_offset(key) is None:
+                self._new[key] = None
+            self._decoded.pop(key, None)
+            self._changed[key] = dict(entry)
+            self._unsaved[key] = None
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key not in self:
+                raise KeyError(key)
+            self._changed.pop(key, None)
+            self._decoded.pop(key, None)
+            if key in self._new:
+                del self._new[key]
+            else:
+                self._deleted.add(key)
+            self._unsaved[key] = None
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self.get(key, default)
+            if key in self:
+                del self[key]
+            return value
+
+    def __len__(self):
+        with self._lock:
+            count = self._snap.count if self._snap else 0
+            return count - len(self._deleted) + len(self._new)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        with self._lock:
+            keys = []
+            if self._snap:
+                for off in self._snap.offsets():
+                    key = self._snap.digest_at(off).hex()
+                    if key not in self._deleted:
+                        keys.append(key)
+            keys.extend(self._new)
+            return keys
+
+    def items(self):
+        with self._lock:
+            return [(k, self[k]) for k in self.keys()]
+
+    def values(self):
+        return [v for _, v in self.items()]
+
+    def update(self, other):
+        for key, entry in dict(other).items():
+            self[key] = entry
+
+    # -- answer stats ----------------------------------------------------
+    def lookup(self, key):
+        """Entry to answer from, or None if unknown or not trusted enough."""
+        with self._lock:
+            self.session["lookups"] += 1
+            entry = self.get(key)
+            if entry is None or not entry.get("correct"):
+                return None
+            if confidence(entry) < MIN_CONFIDENCE:
+                self.session["low_confidence"] += 1
+                return None
+            entry = dict(entry, hits=entry.get("hits", 0) + 1, last_hit=int(time.time()))
+            self[key] = entry
+            self.session["hits"] += 1
+            return entry
+
+    def record(self, key, question, answers, correct, source):
+        """Store a known answer; repeating the stored one counts as a confirmation."""
+        with self._lock:
+            old = self.get(key)
+            if old is not None and old.get("correct") == correct:
+                self.verify(key, True)
+                return
+            self[key] = {"question": question, "answers": answers, "correct": correct,
+                         "source": source, "added": int(time.time()), "hits": 0,
+                         "confirmed": 0, "failures": 0}
+
+    def verify(self, key, ok):
+        """Fold in the revealed outcome of a cached answer.
+
+        Returns False when the entry failed and was dropped.
+        """
+        with self._lock:
+            entry = self.get(key)
+            if entry is None:
+                return False
+            field = "confirmed" if ok else "failures"
+            entry = dict(entry, last_verified=int(time.time()))
+            entry[field] = entry.get(field, 0) + 1
+            entry["fail_streak"] = 0 if ok else entry.get("fail_streak", 0) + 1
+            self.session["confirmed" if ok else "failed"] += 1
+            if not ok and (confidence(entry) < MIN_CONFIDENCE or entry["fail_streak"] >= MAX_FAIL_STREAK):
+                del self[key]
+                self.session["invalidated"] += 1
+                return False
+            self[key] = entry
+            return True
+
+    def report(self):
+        s = self.session
+        rate = s["hits"] / s["lookups"] if s["lookups"] else 0.0
+        return (f"{s['hits']}/{s['lookups']} cache hits ({rate:.0%}), "
+                f"{s['low_confidence']} skipped as low-confidence, {s['confirmed']} confirmed, "
+                f"{s['failed']} failed, {s['invalidated']} invalidated")
+
+    @property
+    def dirty(self):
+        return bool(self._unsaved)
+
+    def marker(self):
+        """Position of the saved state: snapshot identity and log offset."""
+        with self._lock:
+            return {"snapshot": self._snap.id if self._snap else None, "log": self._log_bytes}
+
+    def changed_since(self, marker):
+        """Keys saved to the log after `marker` (from marker()), in log order.
+
+        Returns None when the snapshot has been rewritten since, as its
+        changes are then folded in and no longer in the log.
+        """
+        with self._lock:
+            current = self.marker()
+            try:
+                on_disk = _file_id(os.stat(self.path)) if self._snap else None
+            except FileNotFoundError:
+                on_disk = None
+            if (marker.get("snapshot") != current["snapshot"] or on_disk != current["snapshot"]
+                    or not 0 <= marker.get("log", -1) <= current["log"]):
+                return None
+            records, _ = append_log.replay(self._log_path, marker["log"], end=current["log"])
+            return list(dict.fromkeys(rec["key"] for rec in records))
+
+    # -- persistence ----------------------------------------------------
+    def _replay(self):
+        records, self._log_bytes = append_log.replay(self._log_path, repair=not self.readonly)
+        for rec in records:
+            if "entry" in rec:
+                self[rec["key"]] = rec["entry"]
+            elif rec["key"] in self:
+                del self[rec["key"]]
+        self._unsaved.clear()
+
+    def save(self):
+        """Append the changes since the last save to the log (no-op when clean)."""
+        with self._lock:
+            if not self._unsaved:
+                return
+            if self.readonly:
+                raise ValueError(f"{self.path} was opened read-only")
+            records = []
+            for key in self._unsaved:
+                rec = {"key": key}
+                if key in self:
+                    rec["entry"] = self[key]
+                records.append(rec)
+            self._log_bytes += append_log.append(self._log_path, records)
+            self._unsaved.clear()
+            snap_bytes = os.path.getsize(self.path) if self._snap else 0
+            if self._log_bytes > max(LOG_COMPACT_MIN, snap_bytes // 4):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the snapshot with every change and empty the log."""
+        with self._lock:
+            if not (self._changed or self._deleted or self._log_bytes):
+                return
+            if self.readonly:
+                raise ValueError(f"{self.path} was opened read-only")
+            strings = self._snap.all_strings() if self._snap else []
+            ids = {s: i for i, s in enumerate(strings)}
+
+            def intern(s):
+                if s not in ids:
+                    ids[s] = len(strings)
+                    strings.append(s)
+                return ids[s]
+
+            def encode(digest, entry):
+                answers = [str(a) for a in entry.get("answers") or []]
+                question = str(entry.get("question", "")).encode("utf-8")
+                extra = {k: v for k, v in entry.items() if k not in _BASE_FIELDS}
+                extra = json.dumps(extra, ensure_ascii=False).encode("utf-8") if extra else b""
+                correct = entry.get("correct")
+                return (REC_HEAD.pack(digest, len(answers), len(question), len(extra),
+                                      intern(correct) if correct is not None else -1)
+                        + struct.pack(f"<{len(answers)}I", *(intern(a) for a in answers))
+                        + question + extra)
+
+            records = []          # (digest, bytes) in insertion order
+            if self._snap:
+                for off in self._snap.offsets():
+                    digest = self._snap.digest_at(off)
+                    key = digest.hex()
+                    if key in self._deleted:
+                        continue
+                    if key in self._changed:
+                        records.append((digest, encode(digest, self._changed[key])))
+                    else:
+                        records.append((digest, self._snap.raw(off)))
+            for key in self._new:
+                digest = _digest(key)
+                records.append((digest, encode(digest, self._changed[key])))
+
+            blobs = [s.encode("utf-8") for s in strings]
+            keys_off = HEADER.size
+            strings_off = keys_off + KEY_ROW.size * len(records)
+            records_off = strings_off + OFFSET.size * (len(blobs) + 1) + sum(map(len, blobs))
+
+            rows, at = [], records_off
+            for digest, raw in records:
+                rows.append((digest, at))
+                at += len(raw)
+            rows.sort()
+
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, len(records), len(blobs),
+                                    keys_off, strings_off, records_off))
+                f.write(b"".join(KEY_ROW.pack(d, o) for d, o in rows))
+                at = 0
+                offsets = [0]
+                for b in blobs:
+                    at += len(b)
+                    offsets.append(at)
+                f.write(b"".join(OFFSET.pack(o) for o in offsets))
+                f.write(b"".join(blobs))
+                f.write(b"".join(raw for _, raw in records))
+
+            # The old map must be closed before replacing the file on Windows.
+            if self._snap:
+                self._snap.close()
+                self._snap = None
+            try:
+                os.replace(tmp, self.path)
+            except OSError as e:
+                os.remove(tmp)
+                print(f"⚠️ Could not write {self.path}: {e}")
+                if os.path.exists(self.path):
+                    self._snap = Snapshot(self.path)
+                return
+            self._snap = Snapshot(self.path)
+            self._changed.clear()
+            self._new.clear()
+            self._deleted.clear()
+            self._decoded.clear()
+            self._unsaved.clear()
+            # Replaying the log over the new snapshot would be harmless, so a
+            # crash before this point loses nothing.
+            with open(self._log_path, "wb"):
+                pass
+            self._log_bytes = 0
+
+    def close(self):
+        with self._lock:
+            if self._snap:
+                self._snap.close()
+                self._snap = None
+
+# -------------------------------------------------
+def load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def load_cache(path=CACHE_FILE, readonly=False):
+    """Open the cache for `path` (the JSON file name).
+
+    The JSON file only seeds a cache that has no snapshot yet; use
+    import_json() to bring in entries from it later. With readonly=True
+    the seed stays in memory and a damaged snapshot is left for the
+    writer to rebuild.
+    """
+    snap = snapshot_path(path)
+    try:
+        cache = AnswerCache(snap, readonly)
+    except ValueError as e:
+        if readonly:
+            raise
+        print(f"⚠️ {e}; rebuilding from {path}")
+        os.remove(snap)
+        cache = AnswerCache(snap)
+    if cache._snap is None and not len(cache) and os.path.exists(path):
+        cache.update(load_json(path))
+        if readonly:
+            cache._unsaved.clear()
+        else:
+            cache.compact()
+    return cache
+
+def import_json(cache, path=CACHE_FILE):
+    """Add the entries of a JSON cache file that `cache` does not have; returns how many."""
+    added = 0
+    for key, entry in load_json(path).items():
+        if key not in cache:
+            cache[key] = entry
+            added += 1
+    cache.save()
+    return added
+
+def save_cache(cache):
+    cache.save()
+
+def export_json(cache, path=CACHE_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(cache.items()), f, indent=2, ensure_ascii=False)
+
+# -------------------------------------------------
+def bench(n=100000):
+    import random
+    rng = random.Random(0)
+    pool = [f"Answer {i}" for i in range(max(4, n // 2))]
+    data = {}
+    for i in range(n):
+        q = f"Synthetic question number {i}: which option is right?"
+        answers = rng.sample(pool, 4)
+        data[make_key(q, answers)] = {"question": q, "answers": answers, "correct": answers[0]}
+    probes = rng.sample(list(data), min(1000, n))
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "cache.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        t0 = time.perf_counter()
+        load_json(path)
+        json_load = time.perf_counter() - t0
+
+        load_cache(path).close()            # builds the snapshot
+        t0 = time.perf_counter()
+        cache = load_cache(path)
+        snap_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for k in probes:
+            cache[k]["correct"]
+        lookup = (time.perf_counter() - t0) / len(probes)
+        sizes = os.path.getsize(path), os.path.getsize(cache.path)
+        cache.close()
+
+    print(f"{n} entries")
+    print(f"JSON      {sizes[0] / 1e6:8.1f} MB  load {json_load * 1000:8.1f} ms")
+    print(f"snapshot  {sizes[1] / 1e6:8.1f} MB  load {snap_load * 1000:8.1f} ms  "
+          f"lookup {lookup * 1e6:.1f} µs")
+
+def _cli(argv):
+    cmd = argv[0] if argv else ""
+    if cmd == "export":
+        cache = load_cache()
+        out = argv[1] if len(argv) > 1 else CACHE_FILE
+        export_json(cache, out)
+        print(f"Exported {len(cache)} entries to {out}")
+    elif cmd == "import":
+        args = argv[1:]
+        replace = "--replace" in args
+        args = [a for a in args if a != "--replace"]
+        src = args[0] if args else CACHE_FILE
+        snap = snapshot_path(CACHE_FILE)
+        if replace:
+            for p in (snap, snap + LOG_EXT):
+                if os.path.exists(p):
+                    os.remove(p)
+            cache = AnswerCache(snap)
+            cache.update(load_json(src))
+            cache.compact()
+            print(f"Rebuilt {snap} from {src}: {len(cache)} entries")
+        else:
+            cache = load_cache()
+            print(f"Imported {import_json(cache, src)} new entries from {src} ({len(cache)} total)")
+    elif cmd == "bench":
+        bench(int(argv[1]) if len(argv) > 1 else 100000)
+    else:
+        print(__doc__)
+
+if __name__ == "__main__":
+    _cli(sys.argv[1:])
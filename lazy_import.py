@@ -0,0 +1,56 @@
+"""
+Background imports for the heavy modules (cv2, numpy, rag -> chromadb,
+sentence_transformers, ddgs, bs4, readability).
+
+The bots call preload(...) first thing, launch the browser while the
+imports run on a worker thread, and only block in get(name) when the
+module is actually needed (usually long after the manual join step).
+"""
+import importlib
+import threading
+import time
+
+STARTED = time.perf_counter()
+
+_ready = {}      # module name -> Event set once its import finished (or failed)
+_timings = {}    # module name -> import seconds
+_worker = None   # the preload thread, which must never wait on itself
+
+# -------------------------------------------------
+def preload(*names):
+    """Import the given modules, in order, on a daemon thread."""
+    global _worker
+    events = {name: _ready.setdefault(name, threading.Event()) for name in names}
+
+    def run():
+        for name in names:
+            t0 = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception:
+                pass    # re-raised by get() in the thread that needs it
+            _timings[name] = time.perf_counter() - t0
+            events[name].set()
+
+    _worker = threading.Thread(target=run, daemon=True, name="preload")
+    _worker.start()
+
+def get(name):
+    """Return the module, waiting only for its own background import if needed."""
+    ready = _ready.get(name)
+    if ready is not None and threading.current_thread() is not _worker:
+        ready.wait()
+    return importlib.import_module(name)
+
+def since_start():
+    return time.perf_counter() - STARTED
+
+def report():
+    """One-line summary of background import times."""
+    parts = []
+    for name in _ready:
+        if name in _timings:
+            parts.append(f"{name} {_timings[name]:.2f}s")
+        else:
+            parts.append(f"{name} (loading)")
+    return "Background imports: " + (", ".join(parts) if parts else "none")
@@ -1,70 +1,57 @@
-import json, time, hashlib, keyboard, cv2, numpy as np
+import lazy_import
+lazy_import.preload("numpy", "cv2", "detector")   # heavy imports overlap with browser launch
+import os, time
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from driver_resolver import resolve_driver
+from browser_session import open_session, close_session
+import tracing
+from scan_schedule import ScanSchedule, click_and_scan, record_outcome, correction_handlers
+from profiler import QuestionProfiler, start_hotkey, PROFILE_KEY
+from inputs import open_input, CorrectionWindow, ANSWER, SKIP
+from kahoot_cache import CACHE_FILE, load_cache, save_cache, make_key, confidence, answer_index
 
 # -------------------------------------------------
 # --- Configuration ---
-SCAN_INTERVAL = 0.25      # seconds between scans
-SCAN_DURATION = 2.0       # total time to scan after answering
+SCAN_DURATION = 2.0       # max time to scan after answering (see scan_schedule.py)
+CORRECTION_WINDOW = 3.0   # seconds to press Shift+1–4 after a miss
+REUSE_BROWSER = True      # attach to a persistent browser instead of launching a new one
 # -------------------------------------------------
 
-CACHE_FILE = "kahoot_cache.json"
-
-def load_cache():
-    try:
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
-
-def save_cache(cache):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
-
-def make_key(question, answers):
-    key_text = question.strip().lower() + "|" + "|".join(sorted(a.strip().lower() for a in answers))
-    return hashlib.sha1(key_text.encode()).hexdigest()
-
-# -------------------------------------------------
-def count_green_checks(driver):
-    """Screenshot bottom-right corner and count green check icons."""
-    driver.save_screenshot("frame.png")
-    img = cv2.imread("frame.png")
-    if img is None:
-        return 0
-
-    h, w, _ = img.shape
-    crop = img[int(h * 0.6):h, int(w * 0.6):w]
-    hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
-
-    lower = np.array([45, 80, 80])
-    upper = np.array([90, 255, 255])
-    mask = cv2.inRange(hsv, lower, upper)
-
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    valid = [c for c in contours if 200 < cv2.contourArea(c) < 5000]
-    return len(valid)
 # -------------------------------------------------
-
 def main():
-    opts = Options()
-    opts.add_argument("--start-maximized")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
-    driver.get("https://kahoot.it")
+    if REUSE_BROWSER:
+        driver = open_session("chrome", "https://kahoot.it")
+    else:
+        opts = Options()
+        opts.add_argument("--start-maximized")
+        driver = webdriver.Chrome(service=Service(resolve_driver("chrome")), options=opts)
+        driver.get("https://kahoot.it")
+    print(f"🟣 Browser ready after {lazy_import.since_start():.1f}s")
 
     print("🟣 Join Kahoot manually.")
     input("Press Enter when a question is visible...")
+    print(lazy_import.report())
+    gate = lazy_import.get("detector").FrameGate()
+    schedule = ScanSchedule(SCAN_DURATION)
 
     cache = load_cache()
     print(f"Loaded {len(cache)} cached questions.\n")
+    keys = open_input()
+    profiler = QuestionProfiler(out_dir=os.path.dirname(os.path.abspath(CACHE_FILE)))
+    start_hotkey(profiler)
+    print(f"(Press {PROFILE_KEY.upper()} to profile the next few questions)")
+
+    on_correction, on_expire = correction_handlers(cache)
+    corrections = CorrectionWindow(keys, on_correction, on_expire, timeout=CORRECTION_WINDOW)
 
     last_q = ""
 
     while True:
         try:
+            t_scrape = time.perf_counter()
             q_el = driver.find_element(By.CSS_SELECTOR, '[data-functional-selector="block-title"]')
             question = q_el.text.strip()
             if not question or question == last_q:
@@ -76,6 +63,9 @@ def main():
             if not answers:
                 time.sleep(0.2)
                 continue
+            tracing.begin(question, answers=answers, script="main")
+            tracing.add("scrape", time.perf_counter() - t_scrape)
+            profiler.on_question()
 
             print("\n============================")
             print(f"QUESTION: {question}")
@@ -85,82 +75,39 @@ def main():
 
             q_key = make_key(question, answers)
 
-            # --- cached question ---
-            if q_key in cache:
-                corr = cache[q_key]["correct"]
-                print(f"⚡ Cached answer found: {corr}")
-                for b in driver.find_elements(By.CSS_SELECTOR, "button.choice__Choice-sc-ym3b8f-4"):
-                    if corr.lower() in b.text.lower():
-                        b.click()
-                        print("✅ Clicked cached correct answer.")
-                        break
-                last_q = question
-                continue
-
-            # --- manual selection ---
-            print("Press 1–4 to answer, or F3 to skip.")
-            idx = None
-            while idx is None:
-                # Ignore normal 1–4 inputs while Shift is held (for manual correction)
-                if keyboard.is_pressed("shift"):
-                    time.sleep(0.05)
-                    continue
-
-                if keyboard.is_pressed("1"): idx = 0
-                elif keyboard.is_pressed("2"): idx = 1
-                elif keyboard.is_pressed("3"): idx = 2
-                elif keyboard.is_pressed("4"): idx = 3
-                elif keyboard.is_pressed("f3"):
+            # --- cached question (clicked and verified like any other) ---
+            cached = cache.lookup(q_key)
+            idx = answer_index(cached, answers)
+            if idx is not None:
+                conf = confidence(cached)
+                print(f"⚡ Cached answer found: {answers[idx]} ({conf:.0%} confidence)")
+                tracing.note(cache="hit", backend="cache", confidence=round(conf, 2))
+            else:
+                cached = None
+
+                # --- manual selection ---
+                print("Press 1–4 to answer, or F3 to skip.")
+                tracing.note(cache="miss", backend="manual")
+                keys.clear((ANSWER, SKIP))
+                with tracing.span("input"):
+                    event = keys.wait((ANSWER, SKIP))
+                if event.kind == SKIP:
                     print("⏭️  Skipping question.")
                     idx = -1
-                time.sleep(0.05)
+                else:
+                    idx = event.index
 
             if idx == -1:
+                tracing.end(skipped=True)
                 last_q = question
                 continue
 
             buttons = driver.find_elements(By.CSS_SELECTOR, "button.choice__Choice-sc-ym3b8f-4")
             if 0 <= idx < len(buttons):
-                before = count_green_checks(driver)
-                buttons[idx].click()
-                print(f"🖱️ Clicked: {answers[idx]}")
-
-                # --- scan loop for checkmark detection ---
-                correct = None
-                before = count_green_checks(driver)
-                for _ in range(int(SCAN_DURATION / SCAN_INTERVAL)):
-                    time.sleep(SCAN_INTERVAL)
-                    after = count_green_checks(driver)
-                    if after > before:
-                        correct = answers[idx]
-                        print("✅ Correct answer detected (checkmark counter):", correct)
-                        cache[q_key] = {"question": question, "answers": answers, "correct": correct}
-                        save_cache(cache)
-                        print("💾 Saved to cache.")
-                        break
+                outcome = click_and_scan(driver, gate, schedule, buttons[idx], answers[idx])
+                record_outcome(cache, corrections, q_key, question, answers, idx, cached, outcome)
 
-                # --- manual correction if wrong ---
-                if not correct:
-                    print("❌ No checkmark detected — if you know the correct answer, press Shift+1–4 now.")
-                    correction = None
-                    wait_start = time.time()
-                    while time.time() - wait_start < 3:  # 3s to give correction
-                        if keyboard.is_pressed("shift+1"): correction = 0
-                        elif keyboard.is_pressed("shift+2"): correction = 1
-                        elif keyboard.is_pressed("shift+3"): correction = 2
-                        elif keyboard.is_pressed("shift+4"): correction = 3
-                        if correction is not None:
-                            break
-                        time.sleep(0.05)
-
-                    if correction is not None and 0 <= correction < len(answers):
-                        correct = answers[correction]
-                        print(f"✅ Manual correction received: {correct}")
-                        cache[q_key] = {"question": question, "answers": answers, "correct": correct}
-                        save_cache(cache)
-                        print("💾 Saved to cache.")
-                    else:
-                        print("ℹ️ No correction provided. Moving on without saving.")
+            tracing.end()
 
             # --- wait for next question ---
             last_q = question
@@ -181,7 +128,12 @@ def main():
             print("Error:", e)
             time.sleep(0.2)
 
-    driver.quit()
+    print(f"🖼️ Result detector: {gate.report()}")
+    profiler.stop()
+    corrections.close()
+    keys.close()
+    close_session(driver, keep=REUSE_BROWSER)
+    print(f"🗂️ Cache: {cache.report()}")
     save_cache(cache)
     print("✅ Session ended, cache saved.")
 
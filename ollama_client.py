@@ -0,0 +1,98 @@
+"""
+Minimal Ollama client: streaming chat/generate calls and the quiz mode
+with its primed prompt prefix.
+
+Only needs `requests`, so callers that just talk to the model (the ollama
+backend of evaluate.py / precompute.py) need not import rag.py and its
+retrieval stack.
+"""
+import json
+import os
+import threading
+
+import requests
+
+from tracing import note
+
+OLLAMA_MODEL = "phi:latest"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+
+# Quiz mode: a terse instruction instead of the chat persona. The prompt
+# prefix (primed context + system) is identical on every call, so Ollama
+# keeps its KV cache for it and only prefills the question itself.
+QUIZ_SYSTEM_PROMPT = "Answer multiple-choice quiz questions with only the letter of the correct option."
+KEEP_ALIVE = "30m"        # keep the model (and its prefix cache) loaded between questions
+
+_quiz_context = None
+_quiz_lock = threading.Lock()
+
+def _stream(url, payload, stats=None):
+    """POST a streaming Ollama request; returns the concatenated text."""
+    text = ""
+    with requests.post(url, json=payload, stream=True, timeout=120) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+                if "message" in data and "content" in data["message"]:
+                    text += data["message"]["content"]
+                elif "response" in data:
+                    text += data["response"]
+                if data.get("done") and stats is not None:
+                    stats["prompt_tokens"] = data.get("prompt_eval_count", 0)
+                    stats["completion_tokens"] = data.get("eval_count", 0)
+            except json.JSONDecodeError:
+                text += line
+    return text.strip()
+
+def ollama_generate(prompt, temperature=0.7, max_tokens=400, stats=None, system=None):
+    """Stream a chat completion. If `stats` is a dict, token counts are stored in it."""
+    messages = [{"role": "system", "content": system.strip()}] if system else []
+    messages.append({"role": "user", "content": prompt.strip()})
+    payload = {
+        "model": OLLAMA_MODEL,
+        "messages": messages,
+        "options": {"temperature": temperature, "num_predict": max_tokens},
+        "stream": True
+    }
+    return _stream(f"{OLLAMA_URL}/api/chat", payload, stats)
+
+def _quiz_prefix():
+    """Token context for the quiz system prompt, primed once per process."""
+    global _quiz_context
+    with _quiz_lock:
+        if _quiz_context is None:
+            r = requests.post(f"{OLLAMA_URL}/api/generate", json={
+                "model": OLLAMA_MODEL,
+                "system": QUIZ_SYSTEM_PROMPT,
+                "prompt": "Ready.",
+                "stream": False,
+                "keep_alive": KEEP_ALIVE,
+                "options": {"num_predict": 1},
+            }, timeout=120)
+            r.raise_for_status()
+            _quiz_context = r.json().get("context") or []
+        return _quiz_context
+
+def ollama_quiz(prompt, max_tokens=8, stats=None):
+    """Short, low-temperature answer in quiz mode, reusing the cached prefix."""
+    # `system` is sent with the primed context too: without it Ollama falls
+    # back to the Modelfile's SYSTEM. It is one short line, and the
+    # prompt_eval_count noted below shows what each question prefilled.
+    payload = {
+        "model": OLLAMA_MODEL,
+        "system": QUIZ_SYSTEM_PROMPT,
+        "prompt": prompt.strip(),
+        "keep_alive": KEEP_ALIVE,
+        "options": {"temperature": 0.1, "num_predict": max_tokens},
+        "stream": True,
+    }
+    context = _quiz_prefix()
+    if context:
+        payload["context"] = context
+    gen_stats = {} if stats is None else stats
+    text = _stream(f"{OLLAMA_URL}/api/generate", payload, gen_stats)
+    note(quiz_prompt_tokens=gen_stats.get("prompt_tokens"))
+    return text
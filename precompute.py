@@ -0,0 +1,160 @@
+"""
+Pre-answer a known quiz before the game starts.
+
+Reads the questions of a quiz, answers every one that is not cached yet
+through one of the evaluate.py backends (in parallel, rate-limited) and
+writes the answers into the answer cache (kahoot_cache.py) with "source": "precomputed", so
+during the game each question is a plain cache hit.
+
+    python precompute.py quiz.json --backend ollama --concurrency 4 --rate 2
+    python precompute.py kahoot_trace.jsonl --backend gemini --rate 0.5
+
+Accepted inputs:
+    *.jsonl   a tracing.py trace (question + answers of past sessions)
+    *.json    a list of {"question", "answers"} objects, a Kahoot export
+              ({"questions": [{"question", "choices": [{"answer", "correct"}]}]})
+              or another kahoot_cache.json
+
+Export entries that already mark the correct choice are copied straight in
+(source "export") without asking a model.
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from evaluate import make_backend
+from kahoot_cache import CACHE_FILE, load_cache, save_cache, make_key
+
+SAVE_EVERY = 10           # answered questions between cache writes
+
+# -------------------------------------------------
+def _entry(question, answers, correct=None):
+    answers = [a for a in answers if a]
+    if not question or not answers:
+        return None
+    return {"question": question.strip(), "answers": answers, "correct": correct}
+
+def load_questions(path):
+    """Return [{question, answers, correct-or-None}] without duplicates."""
+    entries = []
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries.append(_entry(rec.get("question", ""), rec.get("answers") or []))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and "questions" in data:
+            for q in data["questions"]:
+                choices = q.get("choices") or []
+                right = [c.get("answer", "") for c in choices if c.get("correct")]
+                entries.append(_entry(q.get("question", ""), [c.get("answer", "") for c in choices],
+                                      right[0] if len(right) == 1 else None))
+        else:
+            items = data.values() if isinstance(data, dict) else data
+            for q in items:
+                entries.append(_entry(q.get("question", ""), q.get("answers") or [], q.get("correct")))
+
+    seen = set()
+    unique = []
+    for e in entries:
+        if e is None:
+            continue
+        key = make_key(e["question"], e["answers"])
+        if key not in seen:
+            seen.add(key)
+            unique.append((key, e))
+    return unique
+
+# -------------------------------------------------
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def precompute(todo, run, cache, concurrency=1, rate=0.0):
+    """Answer `todo` [(key, entry)] with `run` and store the results in `cache`."""
+    limiter = RateLimiter(rate)
+    done = failed = 0
+
+    def one(entry):
+        limiter.acquire()
+        t0 = time.perf_counter()
+        idx, _ = run(entry["question"], entry["answers"])
+        return idx, time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(one, e): (k, e) for k, e in todo}
+        for fut in as_completed(futures):
+            key, entry = futures[fut]
+            try:
+                idx, elapsed = fut.result()
+            except Exception as e:
+                idx, elapsed = None, 0.0
+                print(f"❌ {entry['question'][:60]}: {e}")
+            if idx is None or not 0 <= idx < len(entry["answers"]):
+                failed += 1
+                continue
+            cache.record(key, entry["question"], entry["answers"], entry["answers"][idx], "precomputed")
+            done += 1
+            print(f"✅ [{done}/{len(todo)}] {entry['question'][:60]} → "
+                  f"{entry['answers'][idx]} ({elapsed:.1f}s)")
+            if done % SAVE_EVERY == 0:
+                save_cache(cache)
+
+    save_cache(cache)
+    return done, failed, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser(description="Answer a known quiz ahead of time into the cache.")
+    ap.add_argument("source", help="quiz export (.json) or trace (.jsonl)")
+    ap.add_argument("--backend", choices=["ollama", "rag", "gemini"], default="ollama")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--rate", type=float, default=2.0, help="max requests per second (0 = unlimited)")
+    ap.add_argument("--cache", default=CACHE_FILE)
+    ap.add_argument("--dry-run", action="store_true", help="only list what would be answered")
+    args = ap.parse_args()
+
+    cache = load_cache(args.cache)
+    questions = load_questions(args.source)
+    known = [(k, e) for k, e in questions if e["correct"] and k not in cache]
+    todo = [(k, e) for k, e in questions if not e["correct"] and k not in cache]
+    print(f"{len(questions)} questions: {len(questions) - len(known) - len(todo)} cached, "
+          f"{len(known)} answered by the export, {len(todo)} to compute")
+
+    if args.dry_run:
+        for _, e in todo:
+            print(f"  - {e['question']}")
+        return
+
+    for key, e in known:
+        cache.record(key, e["question"], e["answers"], e["correct"], "export")
+    if not todo:
+        save_cache(cache)
+        return
+
+    run = make_backend(args.backend)
+    done, failed, wall = precompute(todo, run, cache, args.concurrency, args.rate)
+    print(f"\nPrecomputed {done}/{len(todo)} answers in {wall:.1f}s ({failed} unparsed or failed).")
+
+# -------------------------------------------------
+if __name__ == "__main__":
+    main()
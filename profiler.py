@@ -0,0 +1,122 @@
+"""
+Opt-in profiler for a running bot, toggled with a hotkey.
+
+Press F4 during a game to profile the next PROFILE_QUESTIONS questions
+(press again to stop early). For each capture two files are written next
+to kahoot_cache.json:
+
+    profile_<timestamp>.prof    cProfile stats (snakeviz, pstats, ...)
+    profile_<timestamp>.folded  sampled stacks in collapsed format for
+                                flamegraph.pl / speedscope / inferno
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_KEY = "f4"
+PROFILE_QUESTIONS = 5
+SAMPLE_INTERVAL = 0.005   # seconds between stack samples
+
+# -------------------------------------------------
+class QuestionProfiler:
+    """Profiles the thread that created it for the next N questions.
+
+    The bot loop calls on_question() whenever a new question appears;
+    toggle() may be called from any thread (e.g. a hotkey callback).
+    """
+
+    def __init__(self, out_dir=".", questions=PROFILE_QUESTIONS):
+        self.out_dir = out_dir
+        self.questions = questions
+        self._thread_id = threading.get_ident()
+        self._armed = False
+        self._stop_requested = False
+        self._profile = None
+        self._remaining = 0
+        self._samples = Counter()
+        self._sampler = None
+        self._started = 0.0
+
+    @property
+    def active(self):
+        return self._profile is not None
+
+    def toggle(self):
+        if self.active:
+            self._stop_requested = True
+            print("\n⏹️  Profiler will stop at the next question.\n")
+        else:
+            self._armed = not self._armed
+            state = f"armed for the next {self.questions} questions" if self._armed else "disarmed"
+            print(f"\n⏱️  Profiler {state}.\n")
+
+    def on_question(self):
+        """Start, count down or finish a capture. Must run on the bot thread."""
+        if self.active:
+            self._remaining -= 1
+            if self._remaining <= 0 or self._stop_requested:
+                self.stop()
+                return
+        if self._armed and not self.active:
+            self._start()
+
+    def _start(self):
+        self._armed = False
+        self._stop_requested = False
+        self._remaining = self.questions
+        self._samples = Counter()
+        self._started = time.time()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        print(f"⏱️  Profiling started ({self.questions} questions).")
+
+    def stop(self):
+        """Finish the capture (if any) and write the output files."""
+        if not self.active:
+            return None
+        profile, self._profile = self._profile, None
+        profile.disable()
+        self._sampler.join(timeout=1)
+
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._started))
+        base = os.path.join(self.out_dir, f"profile_{stamp}")
+        profile.dump_stats(base + ".prof")
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"⏱️  Profile saved: {base}.prof / {base}.folded")
+        return base
+
+    # ---- sampling ----
+
+    def _sample(self):
+        while self._profile is not None:
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._samples[_fold(frame)] += 1
+            time.sleep(SAMPLE_INTERVAL)
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name}@{os.path.basename(code.co_filename)}:{code.co_firstlineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+# -------------------------------------------------
+def start_hotkey(profiler, key=PROFILE_KEY):
+    """Toggle the profiler with a global hotkey (same pattern as the F2 clipboard thread)."""
+    import keyboard
+
+    def loop():
+        while True:
+            keyboard.wait(key)
+            profiler.toggle()
+
+    threading.Thread(target=loop, daemon=True).start()
@@ -1,20 +1,36 @@
 import os
 import json
+import threading
 import time
 import requests
 import chromadb
-from chromadb.utils import embedding_functions
+from chromadb.api.types import EmbeddingFunction
 from ddgs import DDGS
 from bs4 import BeautifulSoup
 from readability import Document
 
+import context_budget
+import rag_retention
+from embedding_service import QuantizedIndex, get_service
+from hybrid_retriever import HybridRetriever, split_passages
+from kahoot_cache import is_verified
+from ollama_client import ollama_generate, ollama_quiz
+from tracing import note, span
+
 # ==============================
 # CONFIGURATION
 # ==============================
 
-OLLAMA_MODEL = "phi:latest"
-EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 CHROMA_PATH = "./chroma_db"
+# Storage for fetched pages: "int8" / "float16" use a quantized side index,
+# "float32" keeps them in a plain Chroma collection.
+VECTOR_DTYPE = os.getenv("RAG_VECTOR_DTYPE", "int8")
+
+# Confirmed Q&A pairs from the answer cache, indexed incrementally.
+ANSWERS_COLLECTION = "verified_answers"
+INDEX_BATCH = 64
+INDEX_MARKER = os.path.join(CHROMA_PATH, "verified_answers.marker.json")   # cache position last indexed
+VERIFIED_MAX_DISTANCE = 0.25   # cosine distance for a "same question" hit
 
 SYSTEM_PROMPT = """
 You are **Shitty AI**, a sarcastic, chaotic gremlin that lives in Discord chats.
@@ -32,38 +48,6 @@ Personality:
 - Stay in character no matter what.
 """
 
-# ==============================
-# OLLAMA GENERATION (Mistral)
-# ==============================
-
-def ollama_generate(prompt, temperature=0.7, max_tokens=400):
-    url = "http://localhost:11434/api/chat"
-    payload = {
-        "model": OLLAMA_MODEL,
-        "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT.strip()},
-            {"role": "user", "content": prompt.strip()}
-        ],
-        "options": {"temperature": temperature, "num_predict": max_tokens},
-        "stream": True
-    }
-
-    text = ""
-    with requests.post(url, json=payload, stream=True, timeout=120) as r:
-        r.raise_for_status()
-        for line in r.iter_lines(decode_unicode=True):
-            if not line:
-                continue
-            try:
-                data = json.loads(line)
-                if "message" in data and "content" in data["message"]:
-                    text += data["message"]["content"]
-                elif "response" in data:
-                    text += data["response"]
-            except json.JSONDecodeError:
-                text += line
-    return text.strip()
-
 # ==============================
 # RAG PIPELINE
 # ==============================
@@ -90,36 +74,264 @@ def extract_text_from_url(url):
     except Exception:
         return ""
 
+_client = None
+_embed_fn = None
+_store = None
+_retriever = None
+_retention = None
+# Guards the lazy singletons above, so concurrent ask_with_rag() calls
+# (evaluate.py, precompute.py) never open the same QuantizedIndex twice.
+# Re-entrant: get_store() calls get_client().
+_init_lock = threading.RLock()
+
+class ServiceEmbeddingFunction(EmbeddingFunction):
+    """Chroma embedding function backed by the shared, batching EmbeddingService."""
+
+    def __init__(self):
+        self.service = get_service()
+
+    def __call__(self, input):
+        return self.service.embed(input).tolist()
+
+def embed(texts):
+    return get_service().embed(texts)
+
+def get_client():
+    global _client
+    with _init_lock:
+        if _client is None:
+            _client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return _client
+
+def get_embed_fn():
+    global _embed_fn
+    with _init_lock:
+        if _embed_fn is None:
+            _embed_fn = ServiceEmbeddingFunction()
+    return _embed_fn
+
 def get_store():
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
-    embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBED_MODEL)
-    return client.get_or_create_collection("rag_store", embedding_function=embed_fn)
+    global _store
+    with _init_lock:
+        if _store is None:
+            if VECTOR_DTYPE == "float32":
+                store = get_client().get_or_create_collection("rag_store", embedding_function=get_embed_fn())
+            else:
+                store = QuantizedIndex(os.path.join(CHROMA_PATH, f"rag_store_{VECTOR_DTYPE}"), VECTOR_DTYPE)
+                if store.count() == 0:
+                    _import_chroma_pages(store)
+            _store = store
+    return _store
+
+def get_retriever():
+    global _retriever
+    with _init_lock:
+        if _retriever is None:
+            _retriever = HybridRetriever(get_store())
+    return _retriever
+
+def get_retention():
+    global _retention
+    with _init_lock:
+        if _retention is None:
+            _retention = rag_retention.Retention(get_store())
+    return _retention
+
+def _import_chroma_pages(index):
+    """Seed a new quantized index with pages from the float32 Chroma collection."""
+    try:
+        old = get_client().get_collection("rag_store")
+    except Exception:
+        return
+    data = old.get(include=["documents", "metadatas", "embeddings"])
+    if not data["ids"]:
+        return
+    index.add(
+        ids=data["ids"],
+        embeddings=data["embeddings"],
+        documents=data["documents"],
+        metadatas=[dict(m or {}) for m in data["metadatas"]],
+    )
+    print(f"📦 Imported {len(data['ids'])} pages into the {VECTOR_DTYPE} index.")
+
+def get_answer_store():
+    return get_client().get_or_create_collection(
+        ANSWERS_COLLECTION,
+        embedding_function=get_embed_fn(),
+        metadata={"hnsw:space": "cosine"},
+    )
 
-def ask_with_rag(question):
-    store = get_store()
-    if any(x in question.lower() for x in ["who", "what", "when", "where", "why", "how", "news", "data", "info"]):
+# ==============================
+# VERIFIED ANSWER INDEX
+# ==============================
+
+def _read_marker():
+    try:
+        with open(INDEX_MARKER, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _write_marker(marker):
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    tmp = INDEX_MARKER + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(marker, f)
+    os.replace(tmp, INDEX_MARKER)
+
+def index_verified_answers(cache):
+    """Bring ANSWERS_COLLECTION in line with `cache` (an open AnswerCache).
+
+    Ids are the cache keys and each record keeps its answer in the
+    metadata, so only entries that are new or whose answer changed get
+    embedded, and entries the cache has dropped (failed verification) are
+    deleted so they stop showing up as "verified". Precomputed model
+    guesses stay out until a reveal confirms them; otherwise the model's
+    own answers would come back to it as ground truth.
+
+    INDEX_MARKER remembers how far into the cache log the last run got, so
+    normally only the keys saved since are looked at; the whole cache is
+    compared only after a compaction or on the first run. Call it once at
+    startup, before the first question.
+    """
+    marker = _read_marker()
+    current = dict(cache.marker(), cache=os.path.abspath(cache.path))
+    keys = cache.changed_since(marker) if marker.get("cache") == current["cache"] else None
+    if keys == []:
+        return 0
+
+    store = get_answer_store()
+    if keys is None:
+        indexed = store.get(include=["metadatas"])
+        keys = list(cache.keys())
+        stale = [id_ for id_ in indexed["ids"] if id_ not in cache]
+    else:
+        indexed = store.get(ids=keys, include=["metadatas"])
+        stale = [k for k in keys if k not in cache]
+    known = {id_: (meta or {}).get("answer") for id_, meta in zip(indexed["ids"], indexed["metadatas"])}
+
+    new = []
+    for key in keys:
+        entry = cache.get(key)
+        if entry is None:
+            continue
+        if entry.get("correct") and is_verified(entry):
+            if known.get(key) != entry["correct"]:
+                new.append((key, entry))
+        elif key in known:
+            stale.append(key)
+    if stale:
+        store.delete(ids=stale)
+
+    for i in range(0, len(new), INDEX_BATCH):
+        batch = new[i:i + INDEX_BATCH]
+        docs = [e["question"] for _, e in batch]
+        store.upsert(
+            ids=[k for k, _ in batch],
+            documents=docs,
+            embeddings=embed(docs).tolist(),
+            metadatas=[{"answer": e["correct"], "options": " | ".join(e.get("answers", []))}
+                       for _, e in batch],
+        )
+    _write_marker(current)
+    if new or stale:
+        print(f"📚 Indexed {len(new)} verified answers ({len(stale)} removed).")
+    return len(new)
+
+def verified_context(query_vec, n_results=3):
+    """Return (context_text, is_close_match) from previously verified answers."""
+    store = get_answer_store()
+    if store.count() == 0:
+        return "", False
+    res = store.query(query_embeddings=[query_vec.tolist()], n_results=min(n_results, store.count()))
+    lines = []
+    close = False
+    for doc, meta, dist in zip(res["documents"][0], res["metadatas"][0], res["distances"][0]):
+        if dist > VERIFIED_MAX_DISTANCE * 2:
+            continue
+        close = close or dist <= VERIFIED_MAX_DISTANCE
+        lines.append(f"- Q: {doc}\n  Verified answer: {meta['answer']}")
+    if not lines:
+        return "", False
+    return "Previously verified quiz answers:\n" + "\n".join(lines), close
+
+def ask_with_rag(question, stats=None, query=None, quiz=False):
+    """Answer `question` with retrieved context.
+
+    `query` is the text used for retrieval (defaults to the question); quiz
+    callers pass the bare question and options rather than the full prompt,
+    and set `quiz` to answer through ollama_quiz instead of the chat persona.
+    """
+    query = query or question
+    with span("embed_query"):
+        query_vec = embed([query])[0]
+    with span("verified_query"):
+        verified, close = verified_context(query_vec)
+
+    with span("get_store"):
+        store = get_store()
+    if not close and any(x in question.lower() for x in ["who", "what", "when", "where", "why", "how", "news", "data", "info"]):
         print("🔍 Searching the web...")
-        results = web_search(question)
+        with span("web_search"):
+            results = web_search(question)
         texts = []
-        for url, snippet in results:
-            content = extract_text_from_url(url)
-            if content:
-                texts.append((url, content))
-        if texts:
-            for url, text in texts:
+        with span("extract_pages"):
+            for url, snippet in results:
+                content = extract_text_from_url(url)
+                if content:
+                    texts.append((url, content))
+        # Store passages, not whole pages, so retrieval can pick just the relevant parts.
+        stamp = int(time.time() * 1000)
+        passages = [(f"id_{stamp}_{i}_{j}", url, p)
+                    for i, (url, text) in enumerate(texts)
+                    for j, p in enumerate(split_passages(text))]
+        if passages:
+            # One batched embedding call and one add for all fetched pages.
+            with span("embed_pages"):
+                vectors = embed([p for _, _, p in passages])
+            with span("store_add"):
+                ids = [id_ for id_, _, _ in passages]
+                docs = [p for _, _, p in passages]
+                metas = [rag_retention.new_metadata(url, p) for _, url, p in passages]
                 store.add(
-                    documents=[text],
-                    metadatas=[{"url": url}],
-                    ids=[f"id_{int(time.time() * 1000)}"]
+                    ids=ids,
+                    embeddings=vectors.tolist() if VECTOR_DTYPE == "float32" else vectors,
+                    documents=docs,
+                    metadatas=metas,
                 )
+                retriever = get_retriever()
+                retriever.added(ids, docs)
+                retention = get_retention()
+                retention.added(metas)
+                retriever.removed(retention.enforce())
+
+    with span("store_query"):
+        hits = get_retriever().retrieve(query, query_vec)
+        get_retention().touch([id_ for id_, _, _ in hits])
+    with span("context_budget"):
+        context, budget = context_budget.assemble(query, [p for _, p, _ in hits], verified)
+    if budget["saved_tokens"]:
+        print(f"✂️ Context {budget['raw_tokens']} → {budget['context_tokens']} tokens "
+              f"(saved {budget['saved_tokens']} prefill tokens)")
+    note(context_tokens=budget["context_tokens"], prefill_saved=budget["saved_tokens"])
+    if stats is not None:
+        stats["prefill_saved"] = budget["saved_tokens"]
+
+    if quiz:
+        prompt = f"Context:\n{context}\n\n{question}" if context.strip() else question
+        with span("ollama"):
+            return ollama_quiz(prompt, stats=stats)
 
-    results = store.query(query_texts=[question], n_results=3)
-    context = "\n\n".join(results["documents"][0]) if results["documents"] else ""
     if context.strip():
         prompt = f"Use this info if relevant:\n{context}\n\nQuestion: {question}"
     else:
         prompt = f"Question: {question}"
-    return ollama_generate(prompt, temperature=0.6, max_tokens=600)
+    gen_stats = {} if stats is None else stats
+    with span("ollama"):
+        answer = ollama_generate(prompt, temperature=0.6, max_tokens=600, stats=gen_stats,
+                                 system=SYSTEM_PROMPT)
+    context_budget.observe(SYSTEM_PROMPT.strip() + "\n" + prompt, gen_stats.get("prompt_tokens"))
+    return answer
 
 # ==============================
 # SIMPLE REPL
@@ -141,4 +353,10 @@ def main():
             print("Error:", e)
 
 if __name__ == "__main__":
-    main()
+    import sys
+    if sys.argv[1:2] == ["--index"]:
+        # Catch up the verified-answer index without starting the REPL.
+        from kahoot_cache import load_cache
+        print(f"{index_verified_answers(load_cache())} new entries indexed.")
+    else:
+        main()
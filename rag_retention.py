@@ -0,0 +1,252 @@
+"""
+Retention for the RAG page store.
+
+ask_with_rag used to keep every fetched page forever. Each stored page now
+carries `added`, `last_hit`, `hits` and `bytes` in its metadata. Retention
+counts hits on the pages a query returned in memory and writes them to the
+store in batches, and evicts the coldest pages once the store is over
+MAX_DOCS documents or MAX_BYTES of text. Coldness is the last-hit time
+plus HIT_WEIGHT seconds per hit, so a page that keeps being useful
+outlives a newer one-off.
+
+Eviction only deletes rows; compact() rebuilds the store from the survivors
+(a fresh HNSW index for the Chroma collection) and VACUUMs chroma.sqlite3.
+Run it offline, with no bot using the store:
+
+    python rag_retention.py [--max-docs N] [--max-mb M] [--compact]
+
+It prints the on-disk size, document count and query latency before and
+after.
+"""
+import argparse
+import atexit
+import os
+import sqlite3
+import statistics
+import threading
+import time
+
+MAX_DOCS = 20000                  # stored passages
+MAX_BYTES = 50 * 1024 * 1024      # of stored page text
+HIT_WEIGHT = 24 * 3600            # one hit is worth a day of recency
+FLUSH_INTERVAL = 60.0             # seconds between hit-counter writes
+EVICT_TARGET = 0.9                # evict down to this fraction of the budget
+REBUILD_BATCH = 256
+PROBE_QUERIES = [
+    "What is the capital of France?",
+    "Who painted the Mona Lisa?",
+    "How many planets are in the solar system?",
+    "When did World War II end?",
+    "What is the chemical symbol for gold?",
+]
+
+# -------------------------------------------------
+def new_metadata(url, text):
+    now = time.time()
+    return {"url": url, "added": now, "last_hit": now, "hits": 0,
+            "bytes": len(text.encode("utf-8"))}
+
+def _coldness(meta):
+    return float(meta.get("last_hit", 0)) + HIT_WEIGHT * int(meta.get("hits", 0))
+
+def _sizes(store):
+    """[(coldness, bytes, id)] for every stored document."""
+    data = store.get(include=["metadatas", "documents"])
+    rows = []
+    for id_, meta, doc in zip(data["ids"], data["metadatas"], data["documents"]):
+        meta = meta or {}
+        size = int(meta.get("bytes") or len((doc or "").encode("utf-8")))
+        rows.append((_coldness(meta), size, id_))
+    return rows
+
+def _evict(store, max_docs, max_bytes, target=1.0):
+    """Evict the coldest documents down to `target` x the budget.
+
+    Returns (evicted ids, documents left, bytes left).
+    """
+    rows = _sizes(store)
+    count = len(rows)
+    total = sum(size for _, size, _ in rows)
+    if count <= max_docs and total <= max_bytes:
+        return [], count, total
+
+    rows.sort()
+    evict = []
+    for _, size, id_ in rows:
+        if count <= max_docs * target and total <= max_bytes * target:
+            break
+        evict.append(id_)
+        count -= 1
+        total -= size
+    store.delete(ids=evict)
+    print(f"🧹 Evicted {len(evict)} cold RAG documents.")
+    return evict, count, total
+
+def enforce_budget(store, max_docs=MAX_DOCS, max_bytes=MAX_BYTES):
+    """Evict the coldest documents until the store fits the budget; returns the evicted ids."""
+    return _evict(store, max_docs, max_bytes)[0]
+
+# -------------------------------------------------
+class Retention:
+    """Hit counters and budget bookkeeping for a live store, off the question path.
+
+    touch() only counts hits in memory; a timer flushes them into the
+    store's metadata every FLUSH_INTERVAL seconds (and at exit), merged
+    with whatever is stored. Document and byte totals are scanned once and
+    then kept up to date from added() and evictions, so enforce() only
+    reads the whole store when it is actually over budget - and then
+    evicts down to EVICT_TARGET of it, so that happens once per few
+    ingests rather than on every one.
+    """
+
+    def __init__(self, store, max_docs=MAX_DOCS, max_bytes=MAX_BYTES, interval=FLUSH_INTERVAL):
+        self.store = store
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = {}            # id -> [hits, last_hit] not yet in the store
+        self._timer = None
+        self._docs = self._bytes = None
+        atexit.register(self.flush)
+
+    def touch(self, ids):
+        """Record a hit on each returned document."""
+        if not ids:
+            return
+        now = time.time()
+        with self._lock:
+            for id_ in ids:
+                hit = self._pending.setdefault(id_, [0, now])
+                hit[0] += 1
+                hit[1] = now
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def flush(self):
+        """Write the pending hit counts into the store's metadata."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            data = self.store.get(ids=list(pending), include=["metadatas"])
+            metas = []
+            for id_, meta in zip(data["ids"], data["metadatas"]):
+                hits, last_hit = pending[id_]
+                meta = dict(meta or {})
+                meta["hits"] = int(meta.get("hits", 0)) + hits
+                meta["last_hit"] = max(float(meta.get("last_hit", 0)), last_hit)
+                metas.append(meta)
+            if metas:
+                self.store.update(ids=data["ids"], metadatas=metas)
+        except Exception as e:
+            print("⚠️ Could not record RAG hits:", e)
+
+    def added(self, metadatas):
+        with self._lock:
+            if self._docs is not None:
+                self._docs += len(metadatas)
+                self._bytes += sum(int(m.get("bytes", 0)) for m in metadatas)
+
+    def enforce(self):
+        """Evict cold documents if the store is over budget; returns the evicted ids."""
+        with self._lock:
+            docs, size = self._docs, self._bytes
+        if docs is None:
+            rows = _sizes(self.store)
+            docs, size = len(rows), sum(s for _, s, _ in rows)
+        if docs <= self.max_docs and size <= self.max_bytes:
+            with self._lock:
+                self._docs, self._bytes = docs, size
+            return []
+
+        self.flush()        # rank by up-to-date hit counts
+        evicted, docs, size = _evict(self.store, self.max_docs, self.max_bytes, EVICT_TARGET)
+        with self._lock:
+            self._docs, self._bytes = docs, size
+        return evicted
+
+# -------------------------------------------------
+# Offline compaction
+# -------------------------------------------------
+def dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+def query_latency(store, embed, runs=3):
+    """Median ms for a store query over PROBE_QUERIES (embedding excluded)."""
+    vecs = embed(PROBE_QUERIES)
+    times = []
+    for _ in range(runs):
+        for v in vecs:
+            t0 = time.perf_counter()
+            store.query(query_embeddings=[v.tolist()], n_results=3)
+            times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+def compact(rag):
+    """Rebuild the page store from its remaining rows and vacuum Chroma's database."""
+    store = rag.get_store()
+    if rag.VECTOR_DTYPE == "float32":
+        data = store.get(include=["documents", "metadatas", "embeddings"])
+        client = rag.get_client()
+        client.delete_collection(store.name)
+        store = client.get_or_create_collection(store.name, embedding_function=rag.get_embed_fn())
+        for i in range(0, len(data["ids"]), REBUILD_BATCH):
+            end = i + REBUILD_BATCH
+            store.add(
+                ids=data["ids"][i:end],
+                documents=data["documents"][i:end],
+                metadatas=data["metadatas"][i:end],
+                embeddings=[[float(x) for x in e] for e in data["embeddings"][i:end]],
+            )
+        rag._store = store
+    else:
+        store.compact()     # fold the QuantizedIndex journal (evictions included) into its base
+
+    db = os.path.join(rag.CHROMA_PATH, "chroma.sqlite3")
+    if os.path.exists(db):
+        conn = sqlite3.connect(db)
+        try:
+            conn.execute("VACUUM")
+        except sqlite3.Error as e:
+            print("⚠️ VACUUM failed (store in use?):", e)
+        finally:
+            conn.close()
+    return store
+
+def _report(label, rag, store):
+    print(f"{label:<7} {dir_bytes(rag.CHROMA_PATH) / 1e6:8.2f} MB  {store.count():6d} docs  "
+          f"{query_latency(store, rag.embed):7.2f} ms/query")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evict cold RAG documents and compact the store.")
+    parser.add_argument("--max-docs", type=int, default=MAX_DOCS)
+    parser.add_argument("--max-mb", type=float, default=MAX_BYTES / 1024 / 1024)
+    parser.add_argument("--compact", action="store_true", help="rebuild and vacuum after evicting")
+    args = parser.parse_args()
+
+    import rag
+    store = rag.get_store()
+    _report("before", rag, store)
+    enforce_budget(store, args.max_docs, int(args.max_mb * 1024 * 1024))
+    if args.compact:
+        store = compact(rag)
+    _report("after", rag, store)
+
+if __name__ == "__main__":
+    main()
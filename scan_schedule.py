@@ -0,0 +1,165 @@
+"""
+Adaptive screenshot schedule for the post-click result scan.
+
+Replaces fixed SCAN_INTERVAL polling: scans start MIN_INTERVAL after the
+click (or just before the learnt reveal delay) and back off exponentially
+up to MAX_INTERVAL. The caller stops as soon as the outcome is known and
+reports the observed reveal delay, which is kept as an exponential moving
+average in SCAN_STATS_FILE so later sessions aim straight at it.
+
+The click-and-verify step the bots (main.py, autoanswer.py,
+firefox-test.py) share lives here too: click_and_scan() clicks an answer
+and scans for the reveal, record_outcome() updates the answer cache and
+opens the correction window on a miss, and correction_handlers() are the
+CorrectionWindow callbacks that store a manual correction.
+"""
+import json
+import time
+
+import lazy_import
+import tracing
+from kahoot_cache import save_cache
+
+SCAN_STATS_FILE = "scan_stats.json"
+MIN_INTERVAL = 0.05       # first / tightest gap between scans
+MAX_INTERVAL = 0.5        # backoff ceiling
+BACKOFF = 1.5
+REVEAL_LEAD = 0.15        # start this long before the expected reveal
+EWMA_ALPHA = 0.3
+MIN_SAMPLES = 3           # reveals seen before the learnt delay is trusted
+
+# -------------------------------------------------
+class ScanSchedule:
+    def __init__(self, duration=2.0, stats_file=SCAN_STATS_FILE):
+        self.duration = duration
+        self.stats_file = stats_file
+        self.stats = {"reveal_delay": None, "samples": 0}
+        try:
+            with open(stats_file, "r", encoding="utf-8") as f:
+                self.stats.update(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def expected_delay(self):
+        if self.stats["samples"] >= MIN_SAMPLES:
+            return self.stats["reveal_delay"]
+        return None
+
+    def offsets(self):
+        """Yield seconds after the click at which to take a screenshot."""
+        expected = self.expected_delay()
+        t = 0.0
+        limit = self.duration
+        if expected is not None:
+            t = max(0.0, expected - REVEAL_LEAD)
+            limit = max(limit, expected + 1.0)
+        step = MIN_INTERVAL
+        while True:
+            t += step
+            if t > limit:
+                return
+            yield t
+            step = min(step * BACKOFF, MAX_INTERVAL)
+
+    def wait_until(self, clicked_at, offset):
+        """Sleep until `offset` seconds after `clicked_at` (a perf_counter value)."""
+        remaining = clicked_at + offset - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def record(self, delay):
+        """Fold an observed click-to-reveal delay into the moving average."""
+        old = self.stats["reveal_delay"]
+        self.stats["reveal_delay"] = delay if old is None else old + EWMA_ALPHA * (delay - old)
+        self.stats["samples"] += 1
+        try:
+            with open(self.stats_file, "w", encoding="utf-8") as f:
+                json.dump(self.stats, f)
+        except OSError:
+            pass
+
+# -------------------------------------------------
+def read_result(driver, gate=None):
+    """Screenshot the page (in memory) and classify the answer reveal.
+
+    With a detector.FrameGate, unchanged frames reuse the previous result.
+    """
+    if gate is None:
+        gate = lazy_import.get("detector")
+    return gate.classify_png(driver.get_screenshot_as_png())
+
+def scan_for_result(driver, gate, schedule, before, clicked_at):
+    """Screenshot on `schedule` after a click until the reveal is classified.
+
+    Returns "correct", "incorrect" or "unknown" (nothing seen in time).
+    A known outcome stops the scan and teaches the schedule its delay.
+    """
+    detector = lazy_import.get("detector")
+    outcome = "unknown"
+    frames, skipped = gate.frames, gate.skipped
+    with tracing.span("verify"):
+        for offset in schedule.offsets():
+            schedule.wait_until(clicked_at, offset)
+            after = read_result(driver, gate)
+            if detector.is_correct(after, before):
+                outcome = "correct"
+            elif after.label != "unknown":
+                outcome = after.label
+            if outcome != "unknown":
+                reveal = time.perf_counter() - clicked_at
+                schedule.record(reveal)
+                tracing.note(reveal_ms=round(reveal * 1000, 1))
+                break
+    tracing.note(verified=outcome == "correct", frames=gate.frames - frames,
+                 frames_skipped=gate.skipped - skipped)
+    return outcome
+
+def click_and_scan(driver, gate, schedule, button, label):
+    """Click an answer button and return the outcome of scan_for_result()."""
+    before = read_result(driver, gate)
+    with tracing.span("click"):
+        button.click()
+    clicked_at = time.perf_counter()
+    print(f"🖱️ Clicked: {label}")
+    return scan_for_result(driver, gate, schedule, before, clicked_at)
+
+def record_outcome(cache, corrections, key, question, answers, idx, cached, outcome):
+    """Update the cache from the outcome of clicking answers[idx].
+
+    `cached` is the cache entry the answer came from, or None. A cached
+    answer is verified either way; a new one is stored only when the
+    checkmark confirms it. Anything short of a confirmation opens the
+    correction window.
+    """
+    if outcome == "correct":
+        print("✅ Correct answer detected (result detector):", answers[idx])
+        if cached:
+            cache.verify(key, True)
+        else:
+            cache.record(key, question, answers, answers[idx], "checkmark")
+            save_cache(cache)
+            print("💾 Saved to cache.")
+        return
+    if cached and outcome == "incorrect":
+        if not cache.verify(key, False):
+            print("🗑️ Cached answer was wrong — removed from the cache.")
+        save_cache(cache)
+    print("❌ No checkmark detected — if you know the correct answer, press Shift+1–4 now.")
+    corrections.open({"key": key, "question": question, "answers": answers})
+
+def correction_handlers(cache):
+    """(on_correction, on_expire) callbacks for a CorrectionWindow over `cache`."""
+    def on_correction(record, index):
+        answers = record["answers"]
+        if not 0 <= index < len(answers):
+            return
+        correct = answers[index]
+        print(f"\n✅ Manual correction received: {correct}")
+        cache.record(record["key"], record["question"], answers, correct, "correction")
+        save_cache(cache)
+        print("💾 Saved to cache.")
+
+    def on_expire(record):
+        print(f"\nℹ️ No correction provided for {record['question']!r}. Not saved.")
+
+    return on_correction, on_expire
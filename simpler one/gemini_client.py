@@ -2,6 +2,8 @@
 from google import genai
 from google.genai import types
 
+from answer_parser import option_letters
+
 # =========================================================
 # CONFIG
 # =========================================================
@@ -75,13 +77,18 @@ def _extract_text(response):
     return ""
 
 
-def _generate(model, contents, config):
+def _generate(model, contents, config, stats=None):
     client = _get_client()
-    return client.models.generate_content(
+    response = client.models.generate_content(
         model=model,
         contents=contents,
         config=config,
     )
+    if stats is not None:
+        usage = getattr(response, "usage_metadata", None)
+        stats["prompt_tokens"] = getattr(usage, "prompt_token_count", 0) or 0
+        stats["completion_tokens"] = getattr(usage, "candidates_token_count", 0) or 0
+    return response
 
 
 def _config_for(temperature, max_output_tokens):
@@ -122,13 +129,13 @@ def ask_gemini_needs_image(question, answers):
 # =========================================================
 
 
-def answer_text_only(question, answers):
+def answer_text_only(question, answers, stats=None):
     labeled = [f"{chr(65+i)}) {a}" for i, a in enumerate(answers)]
 
     prompt = (
         "This is a multiple-choice question.\n"
         "Choose the correct answer.\n"
-        "Reply ONLY with A, B, C, or D.\n\n"
+        f"Reply ONLY with {option_letters(len(answers))}.\n\n"
         f"Question:\n{question}\n\n"
         "Options:\n" + "\n".join(labeled)
     )
@@ -137,6 +144,7 @@ def answer_text_only(question, answers):
         MODEL_TEXT,
         prompt,
         _config_for(temperature=0.2, max_output_tokens=10),
+        stats,
     )
 
     return _extract_text(response).strip()
@@ -146,7 +154,7 @@ def answer_text_only(question, answers):
 # =========================================================
 
 
-def answer_with_image(question, answers, image_path):
+def answer_with_image(question, answers, image_path, stats=None):
     labeled = [f"{chr(65+i)}) {a}" for i, a in enumerate(answers)]
 
     with open(image_path, "rb") as f:
@@ -157,7 +165,7 @@ def answer_with_image(question, answers, image_path):
         "The image may be helpful or decorative.\n"
         "Only use the image if it is relevant.\n"
         "Choose the correct answer.\n"
-        "Reply ONLY with A, B, C, or D.\n\n"
+        f"Reply ONLY with {option_letters(len(answers))}.\n\n"
         f"Question:\n{question}\n\n"
         "Options:\n" + "\n".join(labeled)
     )
@@ -169,6 +177,7 @@ def answer_with_image(question, answers, image_path):
             types.Part.from_bytes(data=img_bytes, mime_type="image/png"),
         ],
         _config_for(temperature=0.2, max_output_tokens=10),
+        stats,
     )
 
     return _extract_text(response).strip()
@@ -178,11 +187,13 @@ def answer_with_image(question, answers, image_path):
 # =========================================================
 
 
-def ask_gemini(question, answers, image_path=None):
+def ask_gemini(question, answers, image_path=None, stats=None):
     """
-    Returns raw model text (expected: A / B / C / D)
+    Returns raw model text (expected: one option letter, see answer_parser)
+
+    If `stats` is a dict, prompt/completion token counts are stored in it.
     """
 
     if image_path is None:
-        return answer_text_only(question, answers)
-    return answer_with_image(question, answers, image_path)
+        return answer_text_only(question, answers, stats)
+    return answer_with_image(question, answers, image_path, stats)
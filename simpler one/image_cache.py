@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image, UnidentifiedImageError
+
+# =========================================================
+# CONFIG
+# =========================================================
+
+CACHE_DIR = "image_cache"
+INDEX_FILE = "index.json"
+MAX_ENTRIES = 512          # resized PNGs kept on disk
+TARGET_SIZE = 512
+
+# =========================================================
+# IMAGE HELPERS
+# =========================================================
+
+
+def resize_png_bytes(data):
+    """Resize raw image bytes so the short side is TARGET_SIZE, return PNG bytes."""
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.verify()          # validate file
+        img = Image.open(io.BytesIO(data)).convert("RGB")
+    except UnidentifiedImageError:
+        raise RuntimeError("Downloaded file is not a valid image")
+
+    w, h = img.size
+    scale = TARGET_SIZE / min(w, h)
+    img = img.resize((int(w * scale), int(h * scale)), Image.BICUBIC)
+
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+def answer_key(question, answers):
+    """Order-sensitive key: the answer letter depends on the option order."""
+    text = question.strip().lower() + "|" + "|".join(a.strip().lower() for a in answers)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+# =========================================================
+# CACHE
+# =========================================================
+
+
+class ImageCache:
+    """
+    Bounded LRU cache for question images.
+
+    Images are looked up by URL first (no download at all) and then by the
+    SHA-1 of the downloaded bytes (no resize). Each entry stores the resized
+    512px PNG on disk plus the model answers given for that image; the
+    index itself lives in memory and is mirrored to index.json.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.root = root
+        self.max_entries = max_entries
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=4))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=4))
+
+        self._lock = threading.Lock()
+        self._urls = {}                 # url -> digest
+        self._entries = OrderedDict()   # digest -> {"answers": {...}}, LRU order
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    # ---- persistence ----
+
+    def _index_path(self):
+        return os.path.join(self.root, INDEX_FILE)
+
+    def _png_path(self, digest):
+        return os.path.join(self.root, f"{digest}.png")
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        for digest, entry in data.get("entries", []):
+            if os.path.isfile(self._png_path(digest)):
+                self._entries[digest] = entry
+        self._urls = {u: d for u, d in data.get("urls", {}).items() if d in self._entries}
+
+    def _save_index(self):
+        data = {"urls": self._urls, "entries": list(self._entries.items())}
+        tmp = self._index_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self._index_path())
+
+    # ---- LRU bookkeeping ----
+
+    def _touch(self, digest):
+        self._entries.move_to_end(digest)
+        self._entries[digest]["used"] = time.time()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            digest, _ = self._entries.popitem(last=False)
+            self._urls = {u: d for u, d in self._urls.items() if d != digest}
+            try:
+                os.remove(self._png_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _download(self, url):
+        if url.startswith("data:"):
+            header, _, payload = url.partition(",")
+            if header.endswith(";base64"):
+                return base64.b64decode(payload)
+            raise RuntimeError("Unsupported inline image encoding")
+
+        r = self.session.get(url, timeout=10)
+        r.raise_for_status()
+        return r.content
+
+    # ---- public API ----
+
+    def fetch(self, url):
+        """
+        Return (digest, path) for the resized image at url.
+
+        A known URL skips the download, a known content hash skips the resize.
+        """
+        with self._lock:
+            digest = self._urls.get(url)
+            if digest in self._entries:
+                self._touch(digest)
+                return digest, self._png_path(digest)
+
+        content = self._download(url)
+        digest = hashlib.sha1(content).hexdigest()
+
+        with self._lock:
+            self._urls[url] = digest
+            if digest not in self._entries:
+                png = resize_png_bytes(content)
+                with open(self._png_path(digest), "wb") as f:
+                    f.write(png)
+                self._entries[digest] = {"answers": {}}
+            self._touch(digest)
+            self._evict()
+            self._save_index()
+            return digest, self._png_path(digest)
+
+    def get_answer(self, digest, question, answers):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if not entry:
+                return None
+            return entry["answers"].get(answer_key(question, answers))
+
+    def put_answer(self, digest, question, answers, answer):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if not entry:
+                return
+            entry["answers"][answer_key(question, answers)] = answer
+            self._save_index()
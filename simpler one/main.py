@@ -1,12 +1,17 @@
+import os
+import sys
 import time
-import re
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from PIL import Image, UnidentifiedImageError
-import requests
+
+# Shared helpers (tracing, answer parsing, ...) live in the parent directory.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tracing
+from answer_parser import parse_answer
+from browser_session import open_session, close_session
 
 from gemini_client import ask_gemini
 from gemini_client import ask_gemini_needs_image
+from image_cache import ImageCache, resize_png_bytes
 
 # =========================================================
 
@@ -17,128 +22,171 @@ def log(msg):
 # IMAGE HANDLING
 # =========================================================
 
-def resize_to_512(src, dst):
-    try:
-        img = Image.open(src)
-        img.verify()          # validate file
-        img = Image.open(src).convert("RGB")
-    except UnidentifiedImageError:
-        raise RuntimeError("Downloaded file is not a valid image")
-
-    w, h = img.size
-    scale = 512 / min(w, h)
-    img = img.resize((int(w * scale), int(h * scale)), Image.BICUBIC)
-    img.save(dst, format="PNG")
-
-def extract_question_image(driver):
-    imgs = driver.find_elements(By.TAG_NAME, "img")
-
-    best_src = None
-    best_area = 0
-
-    for img in imgs:
-        try:
-            src = img.get_attribute("src")
-            size = img.size
-            area = size["width"] * size["height"]
-            if src and area > best_area:
-                best_src = src
-                best_area = area
-        except:
-            pass
+# One round-trip: returns the src of the largest visible image in the
+# question area (<img> currentSrc/srcset or a CSS background-image).
+FIND_LARGEST_IMAGE_JS = r"""
+const root = document.querySelector('main') || document.body;
+const skip = '[data-functional-selector^="answer-"], [data-functional-selector^="question-choice-"], button';
+const vw = window.innerWidth, vh = window.innerHeight;
+let best = null, bestArea = 0;
+
+function visibleArea(el) {
+    const r = el.getBoundingClientRect();
+    const w = Math.min(r.right, vw) - Math.max(r.left, 0);
+    const h = Math.min(r.bottom, vh) - Math.max(r.top, 0);
+    if (w <= 0 || h <= 0) return 0;
+    const st = getComputedStyle(el);
+    if (st.visibility === 'hidden' || st.display === 'none' || st.opacity === '0') return 0;
+    return w * h;
+}
+
+function consider(el, src) {
+    if (!src || src.startsWith('data:image/svg') || el.closest(skip)) return;
+    const area = visibleArea(el);
+    if (area > bestArea) { best = src; bestArea = area; }
+}
+
+for (const img of root.querySelectorAll('img')) {
+    consider(img, img.currentSrc || img.src);
+}
+for (const el of root.querySelectorAll('*')) {
+    const bg = getComputedStyle(el).backgroundImage;
+    if (!bg || bg === 'none') continue;
+    const m = bg.match(/url\(["']?(.*?)["']?\)/);
+    if (m) consider(el, new URL(m[1], document.baseURI).href);
+}
+return best;
+"""
+
+
+def extract_question_image(driver, cache):
+    """Return (path, digest) for the largest page image, or None."""
+    best_src = driver.execute_script(FIND_LARGEST_IMAGE_JS)
 
     if not best_src:
         return None
 
-    log("Found HTML image, downloading it")
-    r = requests.get(best_src, timeout=10)
-    with open("q_raw.png", "wb") as f:
-        f.write(r.content)
-
-    resize_to_512("q_raw.png", "q.png")
-    return "q.png"
+    log("Found HTML image, fetching it through the image cache")
+    digest, path = cache.fetch(best_src)
+    return path, digest
 
 
 def screenshot_fallback(driver):
     log("No suitable HTML image found, taking screenshot")
-    driver.save_screenshot("q_raw.png")
-    resize_to_512("q_raw.png", "q.png")
+    with open("q.png", "wb") as f:
+        f.write(resize_png_bytes(driver.get_screenshot_as_png()))
     return "q.png"
 
 # =========================================================
 # SELENIUM ACTIONS
 # =========================================================
 
-def get_answer_buttons(driver):
-    buttons = driver.find_elements(By.TAG_NAME, "button")
-    answer_buttons = []
-
-    for b in buttons:
-        try:
-            if b.text.strip():
-                answer_buttons.append(b)
-        except:
-            pass
-
-    return answer_buttons
-
-
-def click_answer(driver, letter):
-    idx = {"A": 0, "B": 1, "C": 2, "D": 3}[letter]
-    buttons = get_answer_buttons(driver)
-
-    log("Detected answer options:")
-    for i, b in enumerate(buttons):
-        log(f"  {i}: {b.text!r}")
-
-    if idx >= len(buttons):
-        raise RuntimeError("Not enough answer buttons detected")
-
-    log(f"Clicking answer {letter}")
-    buttons[idx].click()
-
-
-def click_confidence(driver):
-    time.sleep(0.2)
-    btns = driver.find_elements(
-        By.CSS_SELECTOR,
-        '[data-functional-selector^="confidence-strength-level-"]'
-    )
-    if btns:
-        def level(btn):
-            sel = btn.get_attribute("data-functional-selector") or ""
-            match = re.search(r"(\d+)$", sel)
-            return int(match.group(1)) if match else 0
-
-        btn = max(btns, key=level)
-        sel = btn.get_attribute("data-functional-selector") or "confidence-strength"
-        btn.click()
-        log(f"Clicked confidence ({sel})")
-        return
-
-    for b in driver.find_elements(By.TAG_NAME, "button"):
-        try:
-            text = b.text.strip()
-            if re.search(r"\b(50|75|100)\b", text):
-                b.click()
-                log(f"Clicked confidence (text {text!r})")
-                return
-        except Exception:
-            pass
+CONFIDENCE_WAIT = 0.5     # seconds to wait for the confidence selector after a click
+
+# One round-trip: clicks answer button arguments[0], then watches the DOM and
+# clicks the highest confidence level as soon as the selector appears (or
+# gives up after arguments[1] ms). Times are ms after the script started.
+CLICK_AND_CONFIRM_JS = r"""
+const [idx, waitMs, done] = arguments;
+const t0 = performance.now();
+const since = () => Math.round((performance.now() - t0) * 10) / 10;
+const buttons = [...document.querySelectorAll('button')].filter(b => b.innerText.trim());
+const labels = buttons.map(b => b.innerText.trim());
+if (idx >= buttons.length) {
+    done({error: `only ${buttons.length} answer buttons`, buttons: labels});
+    return;
+}
+
+const result = {buttons: labels, clicked_at: null, confidence: null,
+                confidence_at: null, changed_at: null, done_at: null};
+let observer = null, timer = null;
+
+function finish() {
+    if (result.done_at !== null) return;
+    result.done_at = since();
+    if (observer) observer.disconnect();
+    clearTimeout(timer);
+    done(result);
+}
+
+function level(el) {
+    const m = (el.getAttribute('data-functional-selector') || '').match(/(\d+)$/);
+    return m ? parseInt(m[1], 10) : 0;
+}
+
+function pickConfidence() {
+    const levels = [...document.querySelectorAll('[data-functional-selector^="confidence-strength-level-"]')];
+    let target = null, name = null;
+    if (levels.length) {
+        target = levels.reduce((a, b) => (level(b) > level(a) ? b : a));
+        name = target.getAttribute('data-functional-selector');
+    } else {
+        // Older layouts: a "50 / 75 / 100" button that is not one of the answers.
+        target = [...document.querySelectorAll('button')].find(
+            b => !buttons.includes(b) && /\b(50|75|100)\b/.test(b.innerText));
+        name = target ? `text ${JSON.stringify(target.innerText.trim())}` : null;
+    }
+    if (!target) return false;
+    target.click();
+    result.confidence = name;
+    result.confidence_at = since();
+    return true;
+}
+
+// Only changes to the answer area (or the clicked button going away) count
+// as the page reacting to the click; the countdown ticks all the time.
+const ANSWER_AREA = '[data-functional-selector^="question-choice"], [data-functional-selector^="confidence-"]';
+function answerChange(rec) {
+    const clicked = buttons[idx];
+    if ([...rec.removedNodes].some(n => n === clicked || (n.contains && n.contains(clicked)))) return true;
+    const el = rec.target.nodeType === 1 ? rec.target : rec.target.parentElement;
+    return !!(el && el.closest(ANSWER_AREA));
+}
+
+observer = new MutationObserver(records => {
+    if (result.changed_at === null && records.some(answerChange)) result.changed_at = since();
+    if (pickConfidence()) finish();
+});
+observer.observe(document.body, {childList: true, subtree: true});
+buttons[idx].click();
+result.clicked_at = since();
+if (pickConfidence()) finish();
+else timer = setTimeout(finish, waitMs);
+"""
+
+
+def click_and_confirm(driver, idx, wait=CONFIDENCE_WAIT):
+    """Click answer `idx` and the top confidence level in one scripted action.
+
+    Returns the script's result: clicked_at, confidence_at, changed_at (first
+    DOM change after the click) and done_at in ms, plus round_trip_ms.
+    """
+    t0 = time.perf_counter()
+    res = driver.execute_async_script(CLICK_AND_CONFIRM_JS, idx, int(wait * 1000))
+    res["round_trip_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    log("Detected answer options: " + ", ".join(f"{i}: {b!r}" for i, b in enumerate(res["buttons"])))
+    if res.get("error"):
+        raise RuntimeError(f"Not enough answer buttons detected ({res['error']})")
+    log(f"Clicked answer {chr(65 + idx)} at {res['clicked_at']} ms")
+    if res["confidence"]:
+        log(f"Clicked confidence ({res['confidence']}) at {res['confidence_at']} ms")
+    return res
 
 # =========================================================
 # MAIN LOOP
 # =========================================================
 
 def main():
-    driver = webdriver.Chrome()
-    driver.get("https://kahoot.it")
+    driver = open_session("chrome", "https://kahoot.it")
+    image_cache = ImageCache()
 
     log("Bot started. Waiting for questions...")
     last_question = ""
 
     while True:
         try:
+            t_scrape = time.perf_counter()
             q_els = driver.find_elements(
                 By.CSS_SELECTOR,
                 '[data-functional-selector="block-title"]'
@@ -165,47 +213,71 @@ def main():
             answers = [a.text.strip() for a in ans_els if a.text.strip()]
 
             log(f"Detected answers: {answers}")
+            tracing.begin(question, answers=answers, script="simpler", backend="gemini")
+            tracing.add("scrape", time.perf_counter() - t_scrape)
 
             if len(answers) < 2:
                 log("Not enough answers detected, skipping")
+                tracing.end(skipped=True)
                 time.sleep(1)
                 continue
 
             # ---- ask Gemini (TEXT vs IMAGE decision) ----
             needs_img = False
             try:
-                needs_img = ask_gemini_needs_image(question, answers)
+                with tracing.span("gemini_needs_image"):
+                    needs_img = ask_gemini_needs_image(question, answers)
             except Exception as e:
                 log(f"Image decision failed, defaulting to TEXT: {e}")
 
             img = None
+            img_digest = None
 
             if needs_img:
                 log("Gemini requested image")
                 try:
-                    img = extract_question_image(driver)
-                    if not img:
-                        img = screenshot_fallback(driver)
+                    with tracing.span("image"):
+                        found = extract_question_image(driver, image_cache)
+                        if found:
+                            img, img_digest = found
+                        else:
+                            img = screenshot_fallback(driver)
                 except Exception as e:
                     log(f"Image extraction failed, continuing without image: {e}")
                     img = None
+                    img_digest = None
 
             # ---- answer ----
-            ai_text = ask_gemini(question, answers, img) or ""
-            ai_text = ai_text.strip().upper()
-
-            match = re.search(r"\b([ABCD])\b", ai_text)
-            answer = match.group(1) if match else None
-
-            if not answer:
+            ai_text = None
+            if img_digest:
+                ai_text = image_cache.get_answer(img_digest, question, answers)
+                if ai_text:
+                    log(f"Image answer cache hit: {ai_text!r}")
+                tracing.note(cache="hit" if ai_text else "miss")
+
+            if not ai_text:
+                with tracing.span("gemini"):
+                    ai_text = ask_gemini(question, answers, img) or ""
+            ai_text = ai_text.strip()
+            idx = parse_answer(ai_text, answers)
+
+            if idx is None:
                 log(f"Invalid AI response: {ai_text!r}")
+                tracing.end(invalid=True)
                 time.sleep(1)
                 continue
 
+            answer = chr(65 + idx)
             log(f"Got response to answer {answer}")
+            if img_digest:
+                image_cache.put_answer(img_digest, question, answers, answer)
 
-            click_answer(driver, answer)
-            click_confidence(driver)
+            res = click_and_confirm(driver, idx)
+            tracing.add("click", res["clicked_at"] / 1000)
+            if res["confidence_at"] is not None:
+                tracing.add("confidence", (res["confidence_at"] - res["clicked_at"]) / 1000)
+            tracing.note(state_change_ms=res["changed_at"], click_round_trip_ms=res["round_trip_ms"])
+            tracing.end()
 
             log("Answer submitted\n")
             time.sleep(1.5)
@@ -217,7 +289,7 @@ def main():
             log(f"Unexpected error: {e}")
             time.sleep(1)
 
-    driver.quit()
+    close_session(driver)
 
 
 if __name__ == "__main__":
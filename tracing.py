@@ -0,0 +1,151 @@
+"""
+Per-question latency tracing.
+
+The bots call begin() when a new question is detected, wrap each stage in
+span("name"), and call end() once the question is done. Every question
+becomes one JSON line in TRACE_FILE:
+
+    {"ts": ..., "script": "autoanswer", "question": "...", "answers": [...],
+     "cache": "miss", "backend": "rag", "total_ms": 2143.2,
+     "stages": {"scrape": 31.0, "get_store": 812.4, "web_search": 640.1, ...}}
+
+Spans outside an open question are free no-ops, so library code (rag.py)
+can be instrumented unconditionally.
+
+    python tracing.py [kahoot_trace.jsonl]
+
+prints count / p50 / p95 / max per stage.
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_FILE = "kahoot_trace.jsonl"
+
+_lock = threading.Lock()
+_current = None
+
+# -------------------------------------------------
+class QuestionTrace:
+    def __init__(self, question, fields):
+        self.t0 = time.perf_counter()
+        self.record = {"ts": round(time.time(), 3), "question": question}
+        self.record.update(fields)
+        self.stages = {}
+
+    def add(self, name, seconds):
+        ms = seconds * 1000.0
+        self.stages[name] = round(self.stages.get(name, 0.0) + ms, 2)
+
+def begin(question, **fields):
+    """Start tracing a question. An unfinished previous trace is flushed as incomplete."""
+    global _current
+    with _lock:
+        previous = _current
+        _current = QuestionTrace(question, fields)
+    if previous is not None:
+        _write(previous, {"incomplete": True})
+    return _current
+
+def add(name, seconds):
+    """Record a stage duration measured by the caller."""
+    trace = _current
+    if trace is not None:
+        with _lock:
+            trace.add(name, seconds)
+
+@contextmanager
+def span(name):
+    """Time a stage of the current question; repeated stages accumulate."""
+    if _current is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - t0)
+
+def note(**fields):
+    """Attach fields (cache hit/miss, backend, ...) to the current question."""
+    trace = _current
+    if trace is not None:
+        with _lock:
+            trace.record.update(fields)
+
+def end(**fields):
+    global _current
+    with _lock:
+        trace, _current = _current, None
+    if trace is not None:
+        _write(trace, fields)
+
+def _write(trace, fields):
+    rec = dict(trace.record)
+    rec.update(fields)
+    rec["total_ms"] = round((time.perf_counter() - trace.t0) * 1000.0, 2)
+    rec["stages"] = trace.stages
+    try:
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print("Trace write failed:", e)
+
+# -------------------------------------------------
+# Summary
+# -------------------------------------------------
+def percentile(values, p):
+    """Linear-interpolated percentile (p in 0–100) of a list of numbers."""
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+def load(path=TRACE_FILE):
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+    return records
+
+def summarize(records):
+    stages = {}
+    for rec in records:
+        for name, ms in rec.get("stages", {}).items():
+            stages.setdefault(name, []).append(ms)
+        stages.setdefault("total", []).append(rec.get("total_ms", 0.0))
+
+    print(f"{len(records)} questions traced\n")
+    print(f"{'stage':<20}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    order = sorted(stages, key=lambda s: (s == "total", -percentile(stages[s], 50)))
+    for name in order:
+        v = stages[name]
+        print(f"{name:<20}{len(v):>6}{percentile(v, 50):>10.1f}{percentile(v, 95):>10.1f}{max(v):>10.1f}")
+
+    cache = [r["cache"] for r in records if "cache" in r]
+    if cache:
+        hits = sum(c == "hit" for c in cache)
+        print(f"\ncache hit rate: {hits}/{len(cache)} ({hits / len(cache):.0%})")
+    saved = [r["prefill_saved"] for r in records if "prefill_saved" in r]
+    if saved:
+        print(f"prefill tokens saved: {sum(saved)} total, {sum(saved) / len(saved):.0f}/question")
+    backends = {}
+    for r in records:
+        if "backend" in r:
+            backends[r["backend"]] = backends.get(r["backend"], 0) + 1
+    if backends:
+        print("backends: " + ", ".join(f"{k}={v}" for k, v in sorted(backends.items())))
+
+# -------------------------------------------------
+if __name__ == "__main__":
+    summarize(load(sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE))